@@ -1,27 +1,12 @@
 # app4.py
 import streamlit as st
-import pandas as pd
-import requests
 
-st.title("東京の気象データ可視化")
-
-# Open-Meteo APIからデータ取得
-url = "https://api.open-meteo.com/v1/forecast"
-params = {
-    "latitude": 35.6895,
-    "longitude": 139.6917,
-    "hourly": ["temperature_2m", "relative_humidity_2m"],
-    "timezone": "Asia/Tokyo"
-}
-response = requests.get(url, params=params)
-data = response.json()
+from open_meteo import TOKYO, load_hourly
 
-# データフレームに変換
-df = pd.DataFrame(data["hourly"])
+st.title("東京の気象データ可視化")
 
-# 時刻をdatetime型に変換してindexに設定
-df["time"] = pd.to_datetime(df["time"])
-df.set_index("time", inplace=True)
+# Open-Meteo APIからデータ取得（時刻インデックスのDataFrame、再実行ではキャッシュを使う）
+df = load_hourly(*TOKYO, ["temperature_2m", "relative_humidity_2m"], timezone="Asia/Tokyo")
 
 # タブで表示を切り替え
 tab1, tab2 = st.tabs(["気温（°C）", "湿度（%）"])
@@ -0,0 +1,54 @@
+# open_meteo.py
+# Open-Meteo の予報を取得して、時刻をインデックスにした DataFrame にする共通モジュール
+import numpy as np
+import pandas as pd
+import requests
+import streamlit as st
+
+FORECAST_URL = "https://api.open-meteo.com/v1/forecast"
+TOKYO = (35.6895, 139.6917)
+
+# Open-Meteoの予報は1時間ごとに更新されるので、15分はキャッシュを使う
+CACHE_TTL = 15 * 60
+
+# Keep-Alive で接続を使い回す
+_session = requests.Session()
+
+
+def parse_hourly(hourly, variables):
+    """Open-Meteo の "hourly" を列ごとに変換し、時刻インデックスの DataFrame にする"""
+    index = pd.DatetimeIndex(pd.to_datetime(hourly["time"], format="%Y-%m-%dT%H:%M"), name="time")
+    columns = {
+        # None（欠損）は NaN になる
+        name: np.asarray(hourly.get(name, [None] * len(index)), dtype=np.float64)
+        for name in variables
+    }
+    return pd.DataFrame(columns, index=index)
+
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner="気象データを取得しています...")
+def _fetch_hourly(latitude, longitude, variables, timezone):
+    response = _session.get(
+        FORECAST_URL,
+        params={
+            "latitude": latitude,
+            "longitude": longitude,
+            "hourly": ",".join(variables),
+            "timezone": timezone,
+        },
+        timeout=10,
+    )
+    response.raise_for_status()
+    return parse_hourly(response.json()["hourly"], variables)
+
+
+def load_hourly(latitude, longitude, variables, timezone="Asia/Tokyo"):
+    """時間ごとの予報を取得する（座標・項目・タイムゾーンごとに CACHE_TTL 秒キャッシュ）
+
+    再実行（セレクトボックスやタブの切り替え）ではキャッシュを使うので、
+    APIの呼び出しもJSONの解析も行わない。
+    """
+    # 同じ地点・同じ項目なら順番や細かい桁の違いで別のキャッシュにしない
+    key_variables = tuple(sorted(set(variables)))
+    frame = _fetch_hourly(round(latitude, 4), round(longitude, 4), key_variables, timezone)
+    return frame[list(variables)]
@@ -1,5 +1,13 @@
 from streamlit_elements import elements, html
+from functools import lru_cache
 import base64
+import os
+
+@lru_cache(maxsize=64)
+def _encode_gif(path, mtime):
+    # Read and base64-encode once per (path, mtime); later reruns reuse the result
+    with open(path, "rb") as file:
+        return f"data:image/gif;base64,{base64.b64encode(file.read()).decode('utf-8')}"
 
 def display_gif_icon_direct(gif_path_or_url, size=24):
     with elements("gif_icon_container"):
@@ -8,9 +16,7 @@ def display_gif_icon_direct(gif_path_or_url, size=24):
             gif_src = gif_path_or_url
         else:
             try:
-                with open(gif_path_or_url, "rb") as file:
-                    contents = file.read()
-                    gif_src = f"data:image/gif;base64,{base64.b64encode(contents).decode('utf-8')}"
+                gif_src = _encode_gif(gif_path_or_url, os.path.getmtime(gif_path_or_url))
             except FileNotFoundError:
                 html.div("Animated icon file not found.")
                 return
@@ -0,0 +1,186 @@
+"""ダッシュボードのエンドツーエンド・ベンチマーク
+
+ローカルの代替サーバー（fake_upstream.py）に向けてapp.pyを AppTest で実行し、
+次の値を測る。実際のWeatherBitには一切アクセスしない。
+
+- 初回表示（所在地の自動検出を含む、キャッシュなし）の時間と外部API呼び出し回数
+- 表示切り替え（単位・時間範囲）による再実行の時間（中央値 / p95）と外部API呼び出し回数
+- ブラウザへ送るメッセージのバイト数
+
+使い方:
+    python benchmarks/bench_app.py --runs 20 --latency 0.05
+    python benchmarks/bench_app.py --json --max-warm-ms 500 --max-upstream-warm 0
+
+しきい値を超えたときは終了コード1を返すので、CIで性能の劣化を検出できる。
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_upstream import FakeUpstream  # noqa: E402
+
+
+def percentile(values, q):
+    """q（0〜100）パーセンタイルを返す"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class MessageMeter:
+    """ScriptRunContext.enqueue を包み、ブラウザへ送るメッセージのバイト数を数える"""
+
+    def __init__(self):
+        from streamlit.runtime.scriptrunner_utils.script_run_context import ScriptRunContext
+
+        self._cls = ScriptRunContext
+        self._original = ScriptRunContext.enqueue
+        self.bytes = 0
+        self.messages = 0
+
+    def __enter__(self):
+        meter = self
+        original = self._original
+
+        def enqueue(ctx, msg):
+            meter.bytes += msg.ByteSize()
+            meter.messages += 1
+            return original(ctx, msg)
+
+        self._cls.enqueue = enqueue
+        return self
+
+    def __exit__(self, *exc):
+        self._cls.enqueue = self._original
+
+    def take(self):
+        """前回からのバイト数とメッセージ数を返してリセットする"""
+        result = (self.bytes, self.messages)
+        self.bytes = 0
+        self.messages = 0
+        return result
+
+
+def run_benchmark(runs=20, latency=0.05, timeout=30):
+    upstream = FakeUpstream(latency=latency).start()
+    workdir = tempfile.mkdtemp(prefix="weather-bench-")
+    os.environ.update(upstream.env())
+    os.environ.update({
+        "WEATHER_API_KEY": "bench",
+        "WEATHER_STORE_PATH": os.path.join(workdir, "weather.sqlite3"),
+        "WEATHERBIT_DAILY_LIMIT": "1000000",
+        "WEATHERBIT_RATE_PER_SECOND": "1000",
+        "WEATHERBIT_BURST": "1000",
+    })
+    # 環境変数を設定してから読み込む（モジュール読み込み時にURLとクォータが決まる）
+    from streamlit.testing.v1 import AppTest
+
+    try:
+        with MessageMeter() as meter:
+            at = AppTest.from_file(os.path.join(APP_DIR, "app.py"), default_timeout=timeout)
+
+            started = time.perf_counter()
+            at.run()
+            cold_ms = (time.perf_counter() - started) * 1000
+            if at.exception:
+                raise RuntimeError(f"初回実行で例外: {at.exception[0].message}")
+            cold_bytes, cold_messages = meter.take()
+            cold_upstream = dict(upstream.requests)
+            upstream.reset()
+
+            units = ["Fahrenheit", "Celsius"]
+            hours = [48, 72, 120, 24]
+            warm_ms = []
+            for i in range(runs):
+                if i % 2 == 0:
+                    at.radio[0].set_value(units[(i // 2) % 2])
+                else:
+                    at.select_slider[0].set_value(hours[(i // 2) % len(hours)])
+                started = time.perf_counter()
+                at.run()
+                warm_ms.append((time.perf_counter() - started) * 1000)
+                if at.exception:
+                    raise RuntimeError(f"再実行で例外: {at.exception[0].message}")
+            warm_bytes, warm_messages = meter.take()
+            warm_upstream = dict(upstream.requests)
+    finally:
+        upstream.stop()
+
+    return {
+        "runs": runs,
+        "latency_ms": latency * 1000,
+        "cold": {
+            "ms": round(cold_ms, 1),
+            "upstream_calls": sum(cold_upstream.values()),
+            "upstream_by_endpoint": cold_upstream,
+            "bytes_to_browser": cold_bytes,
+            "messages": cold_messages,
+        },
+        "warm": {
+            "median_ms": round(statistics.median(warm_ms), 1) if warm_ms else 0.0,
+            "p95_ms": round(percentile(warm_ms, 95), 1),
+            "max_ms": round(max(warm_ms), 1) if warm_ms else 0.0,
+            "upstream_calls": sum(warm_upstream.values()),
+            "upstream_by_endpoint": warm_upstream,
+            "bytes_per_rerun": round(warm_bytes / runs) if runs else 0,
+            "messages_per_rerun": round(warm_messages / runs, 1) if runs else 0,
+        },
+    }
+
+
+def check_thresholds(report, max_warm_ms=None, max_upstream_warm=None, max_cold_ms=None):
+    """しきい値を超えた項目の説明のリストを返す"""
+    failures = []
+    if max_cold_ms is not None and report["cold"]["ms"] > max_cold_ms:
+        failures.append(f"初回表示 {report['cold']['ms']}ms > {max_cold_ms}ms")
+    if max_warm_ms is not None and report["warm"]["p95_ms"] > max_warm_ms:
+        failures.append(f"再実行 p95 {report['warm']['p95_ms']}ms > {max_warm_ms}ms")
+    if max_upstream_warm is not None and report["warm"]["upstream_calls"] > max_upstream_warm:
+        failures.append(f"再実行中の外部API呼び出し {report['warm']['upstream_calls']}回 > {max_upstream_warm}回")
+    return failures
+
+
+def print_report(report):
+    cold, warm = report["cold"], report["warm"]
+    print(f"代替サーバーの遅延: {report['latency_ms']:.0f}ms / 再実行 {report['runs']}回")
+    print(f"初回表示   : {cold['ms']:.1f}ms  外部API {cold['upstream_calls']}回  "
+          f"送信 {cold['bytes_to_browser']:,}B ({cold['messages']}メッセージ)")
+    print(f"再実行     : 中央値 {warm['median_ms']:.1f}ms  p95 {warm['p95_ms']:.1f}ms  最大 {warm['max_ms']:.1f}ms")
+    print(f"           : 外部API {warm['upstream_calls']}回  1回あたり送信 {warm['bytes_per_rerun']:,}B "
+          f"({warm['messages_per_rerun']}メッセージ)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ダッシュボードのエンドツーエンド・ベンチマーク")
+    parser.add_argument("--runs", type=int, default=20, help="表示切り替えによる再実行の回数")
+    parser.add_argument("--latency", type=float, default=0.05, help="代替サーバーの応答遅延（秒）")
+    parser.add_argument("--json", action="store_true", help="結果をJSONで出力する")
+    parser.add_argument("--max-cold-ms", type=float, help="初回表示の上限（ミリ秒）")
+    parser.add_argument("--max-warm-ms", type=float, help="再実行 p95 の上限（ミリ秒）")
+    parser.add_argument("--max-upstream-warm", type=int, help="再実行中の外部API呼び出し回数の上限")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(args.runs, args.latency)
+    failures = check_thresholds(report, args.max_warm_ms, args.max_upstream_warm, args.max_cold_ms)
+    report["failures"] = failures
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print_report(report)
+        for failure in failures:
+            print(f"しきい値超過: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,182 @@
+"""WeatherBit / Open-Meteo / ipify / ipinfo の代わりに応答するローカルHTTPサーバー
+
+ベンチマークと負荷試験で使う。応答の遅延（パスごとにも指定可）とエラーの割合を指定できる。
+"""
+import json
+import random
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def _current(city):
+    now = datetime.now()
+    return {"count": 1, "data": [{
+        "city_name": city.title(),
+        "country_code": "JP",
+        "datetime": now.strftime("%Y-%m-%d:%H"),
+        "weather": {"icon": "c02d", "description": "Few clouds", "code": 801},
+        "temp": 18.4, "app_temp": 17.9, "dewpt": 9.1, "rh": 55, "clouds": 25, "uv": 3.2,
+        "vis": 16, "pres": 1012, "wind_spd": 3.4, "wind_cdir_full": "north-northwest",
+        "sunrise": "05:48", "sunset": "17:12",
+    }]}
+
+
+def _hourly(city, hours):
+    start = datetime.now().replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+    return {"city_name": city.title(), "country_code": "JP", "data": [{
+        "timestamp_local": (start + timedelta(hours=i)).strftime("%Y-%m-%dT%H:%M:%S"),
+        "timestamp_utc": (start + timedelta(hours=i)).astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S"),
+        "ts": int((start + timedelta(hours=i)).timestamp()),
+        "temp": round(15 + 5 * ((i % 24) / 12 - 1) ** 2, 1), "app_temp": 15.0, "rh": 60, "pop": 10,
+        "precip": 0.0, "wind_spd": 3.0, "weather": {"icon": "c01d" if 6 <= (start.hour + i) % 24 < 18 else "c01n"},
+    } for i in range(hours)]}
+
+
+def _daily(city):
+    today = datetime.now().date()
+    return {"city_name": city.title(), "country_code": "JP", "data": [{
+        "datetime": (today + timedelta(days=i)).isoformat(),
+        "temp": 16 + i % 4, "max_temp": 21 + i % 4, "min_temp": 11 + i % 3, "pop": 20, "precip": 0.5,
+        "weather": {"icon": ["c01d", "c02d", "r01d", "c03d"][i % 4]},
+    } for i in range(16)]}
+
+
+def _open_meteo_search(name):
+    return {"results": [
+        {"name": name.title(), "country_code": "JP", "latitude": 35.6895, "longitude": 139.6917},
+    ]}
+
+
+def _open_meteo_forecast(query):
+    """要求された current / hourly / daily の項目だけを、Open-Meteo と同じ列ごとの形で返す"""
+    now = datetime.now().replace(minute=0, second=0, microsecond=0)
+    payload = {
+        "latitude": float(query.get("latitude", ["0"])[0]),
+        "longitude": float(query.get("longitude", ["0"])[0]),
+        "utc_offset_seconds": time.localtime().tm_gmtoff,
+    }
+    values = {"weather_code": 2, "is_day": 1, "visibility": 16000, "wind_direction_10m": 330, "relative_humidity_2m": 55}
+    if "current" in query:
+        payload["current"] = {name: values.get(name, 12.5) for name in query["current"][0].split(",")}
+        payload["current"]["time"] = now.strftime("%Y-%m-%dT%H:%M")
+    if "hourly" in query:
+        hours = int(query.get("forecast_hours", ["48"])[0])
+        payload["hourly"] = {name: [values.get(name, 15.0)] * hours for name in query["hourly"][0].split(",")}
+        payload["hourly"]["time"] = [(now + timedelta(hours=i + 1)).strftime("%Y-%m-%dT%H:%M") for i in range(hours)]
+    if "daily" in query:
+        days = int(query.get("forecast_days", ["7"])[0])
+        dates = [now.date() + timedelta(days=i) for i in range(days)]
+        payload["daily"] = {name: [values.get(name, 16.0)] * days for name in query["daily"][0].split(",")}
+        payload["daily"]["time"] = [date.isoformat() for date in dates]
+        if "sunrise" in payload["daily"]:
+            payload["daily"]["sunrise"] = [f"{date.isoformat()}T05:48" for date in dates]
+            payload["daily"]["sunset"] = [f"{date.isoformat()}T17:12" for date in dates]
+    return payload
+
+
+class FakeUpstream:
+    """代替サーバー本体（latency 秒の遅延、error_rate の割合で503を返す）
+
+    path_latency に {"/v2.0/": 2.0} のようにパスの先頭を渡すと、そのパスだけ遅延を変えられる
+    （ヘッジやフェイルオーバーの確認用）。
+    """
+
+    def __init__(self, latency=0.05, error_rate=0.0, seed=0, host="127.0.0.1", port=0, path_latency=None):
+        self.latency = latency
+        self.path_latency = dict(path_latency or {})
+        self.error_rate = error_rate
+        self.requests = Counter()
+        self.bytes_sent = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def env(self):
+        """アプリをこのサーバーに向けるための環境変数"""
+        return {
+            "WEATHERBIT_BASE_URL": f"{self.url}/v2.0/",
+            "IPIFY_URL": f"{self.url}/ipify",
+            "IPINFO_URL": f"{self.url}/ipinfo/{{ip}}/json",
+            "OPEN_METEO_URL": f"{self.url}/open-meteo/v1/forecast",
+            "OPEN_METEO_GEOCODING_URL": f"{self.url}/open-meteo/v1/search",
+        }
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reset(self):
+        with self._lock:
+            self.requests.clear()
+            self.bytes_sent = 0
+
+    def _respond(self, path, query):
+        """(ステータス, JSON) を返す"""
+        city = query.get("city", ["tokyo"])[0]
+        if path == "/ipify":
+            return 200, {"ip": "203.0.113.10"}
+        if path.startswith("/ipinfo/"):
+            return 200, {"ip": path.split("/")[2], "city": "Shinjuku", "region": "Tokyo", "country": "JP", "loc": "35.6938,139.7034"}
+        if path == "/v2.0/current":
+            return 200, _current(city)
+        if path == "/v2.0/forecast/hourly":
+            return 200, _hourly(city, int(query.get("hours", ["48"])[0]))
+        if path == "/v2.0/forecast/daily":
+            return 200, _daily(city)
+        if path == "/open-meteo/v1/search":
+            return 200, _open_meteo_search(query.get("name", ["tokyo"])[0])
+        if path == "/open-meteo/v1/forecast":
+            return 200, _open_meteo_forecast(query)
+        return 404, {"error": "not found"}
+
+    def latency_for(self, path):
+        for prefix, seconds in self.path_latency.items():
+            if path.startswith(prefix):
+                return seconds
+        return self.latency
+
+    def _handler_class(self):
+        upstream = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                endpoint = "ipinfo" if parsed.path.startswith("/ipinfo/") else parsed.path
+                with upstream._lock:
+                    upstream.requests[endpoint] += 1
+                    failed = upstream._random.random() < upstream.error_rate
+                latency = upstream.latency_for(parsed.path)
+                if latency:
+                    time.sleep(latency)
+                status, payload = (503, {"error": "injected"}) if failed else upstream._respond(parsed.path, parse_qs(parsed.query))
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                with upstream._lock:
+                    upstream.bytes_sent += len(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
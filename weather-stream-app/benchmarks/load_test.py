@@ -0,0 +1,420 @@
+"""同時セッション数を増やしながらダッシュボードに負荷をかけ、処理能力を報告する
+
+`streamlit run app.py` を実際に起動し、ブラウザと同じWebSocketプロトコルで
+N 個のセッションを同時に接続して、実際の操作（都市の入力・単位と時間範囲の
+切り替え・自動更新）を繰り返す。外部APIはローカルの代替サーバー
+（fake_upstream.py）なので、WeatherBitのクォータは使わない。
+
+同時セッション数ごとに次の値を出す:
+- 操作による再実行の時間 p50 / p95 / p99 と1秒あたりの再実行回数（最初の表示は別に集計）
+- Streamlitプロセスの CPU使用率（1コア=100%）とRSS
+- 外部APIへのリクエスト数（1秒あたり）
+
+使い方:
+    python benchmarks/load_test.py --sessions 1,2,4,8,16 --duration 20
+    python benchmarks/load_test.py --sessions 4,8 --think 0.2 --json > capacity.json
+
+WebSocketクライアントに websockets パッケージ（Streamlitの依存に含まれる）を使う。
+CPUとRSSは /proc から読むので、Linux以外では表示されない。
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_app import percentile  # noqa: E402
+from fake_upstream import FakeUpstream  # noqa: E402
+
+CITIES = [
+    "Tokyo", "Osaka", "Sapporo", "Fukuoka", "Nagoya", "Kyoto", "Sendai", "Naha",
+    "London", "Paris", "Berlin", "Madrid", "Rome", "New York", "Chicago", "Toronto",
+    "Sydney", "Singapore", "Seoul", "Bangkok",
+]
+
+# 操作と重み（表示の切り替えが多く、都市の変更は少ない）
+ACTIONS = [("unit", 4), ("hours", 4), ("detail", 2), ("city", 1), ("auto_refresh", 1)]
+
+# 操作するウィジェットのラベル（の一部）
+WIDGET_LABELS = {
+    "city": "Enter City Name",
+    "location": "Auto-detect my location",
+    "auto_refresh": "Auto-refresh",
+    "detail": "Detailed Analytics",
+    "unit": "Temperature Unit",
+    "hours": "Hourly Forecast Range",
+}
+WIDGET_TYPES = ("checkbox", "radio", "slider", "text_input")
+
+
+class ProcessMeter:
+    """/proc からプロセスのCPU時間とRSSを読む（Linux以外では None）"""
+
+    def __init__(self, pid):
+        self.pid = pid
+        self._ticks = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+    def cpu_seconds(self):
+        try:
+            with open(f"/proc/{self.pid}/stat") as file:
+                fields = file.read().rsplit(")", 1)[1].split()
+        except OSError:
+            return None
+        # utime, stime は ")" の後ろの12, 13番目
+        return (int(fields[11]) + int(fields[12])) / self._ticks
+
+    def rss_bytes(self):
+        try:
+            with open(f"/proc/{self.pid}/status") as file:
+                for line in file:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1]) * 1024
+        except OSError:
+            pass
+        return None
+
+
+class StreamlitServer:
+    """負荷をかける対象の `streamlit run app.py` プロセス"""
+
+    def __init__(self, env, port=0, timeout=60):
+        self.port = port or _free_port()
+        self.timeout = timeout
+        self._process = subprocess.Popen(
+            [
+                sys.executable, "-m", "streamlit", "run", os.path.join(APP_DIR, "app.py"),
+                "--server.headless", "true",
+                "--server.port", str(self.port),
+                "--browser.gatherUsageStats", "false",
+            ],
+            cwd=APP_DIR,
+            env={**os.environ, **env},
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        self.meter = ProcessMeter(self._process.pid)
+
+    @property
+    def stream_url(self):
+        return f"ws://127.0.0.1:{self.port}/_stcore/stream"
+
+    def wait_ready(self):
+        deadline = time.monotonic() + self.timeout
+        while time.monotonic() < deadline:
+            if self._process.poll() is not None:
+                raise RuntimeError("Streamlitの起動に失敗しました")
+            try:
+                socket.create_connection(("127.0.0.1", self.port), timeout=1).close()
+                return self
+            except OSError:
+                time.sleep(0.2)
+        raise RuntimeError("Streamlitの起動がタイムアウトしました")
+
+    def stop(self):
+        self._process.terminate()
+        try:
+            self._process.wait(10)
+        except subprocess.TimeoutExpired:
+            self._process.kill()
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class BrowserSession:
+    """ブラウザの代わりにWebSocketで接続し、操作ごとの再実行時間を測る"""
+
+    def __init__(self, url, seed, think, timeout, auto_rerun_interval=None):
+        self.url = url
+        self.random = random.Random(seed)
+        self.think = think
+        self.timeout = timeout
+        self.auto_rerun_interval = auto_rerun_interval  # None ならサーバーの指定どおり
+        self.first_loads = []
+        self.latencies = []
+        self.errors = 0
+        self._deltas = OrderedDict()  # delta_path -> ForwardMsg（現在の画面）
+        self._widgets = {}  # ウィジェットID -> WidgetState（ブラウザ側の値）
+        self._labels = {}  # ウィジェットID -> ラベル
+        self._fragments = {}  # ウィジェットID -> フラグメントID
+        self._auto_reruns = {}  # フラグメントID -> 間隔（秒）
+        self._last_auto_rerun = time.monotonic()
+        self._actions, self._weights = zip(*ACTIONS)
+        self._ws = None
+
+    def loop(self, stop):
+        try:
+            from websockets.sync.client import connect
+        except ImportError:
+            raise SystemExit("負荷試験には websockets が必要です（pip install websockets）")
+        try:
+            with connect(self.url, subprotocols=["streamlit"], max_size=None) as ws:
+                self._ws = ws
+                self._rerun()  # 最初の表示（所在地の自動検出）は操作の再実行と分けて集計する
+                self.first_loads.append(self.latencies.pop())
+                while not stop.is_set():
+                    if self.think:
+                        time.sleep(self.random.uniform(0.5, 1.5) * self.think)
+                    if not self._auto_rerun_due():
+                        self._act(self.random.choices(self._actions, self._weights)[0])
+        except Exception as e:
+            print(f"セッションエラー: {e!r}", file=sys.stderr)
+            self.errors += 1
+
+    def _find(self, name):
+        """ラベルからウィジェットのIDを探す（画面にないときは None）"""
+        label = WIDGET_LABELS[name]
+        for widget_id, widget_label in self._labels.items():
+            if label in widget_label and widget_id in self._visible():
+                return widget_id
+        return None
+
+    def _visible(self):
+        return {
+            getattr(msg.delta.new_element, msg.delta.new_element.WhichOneof("type")).id
+            for msg in self._deltas.values()
+            if msg.delta.HasField("new_element") and msg.delta.new_element.WhichOneof("type") in WIDGET_TYPES
+        }
+
+    def _widget_states(self):
+        """画面に表示中のウィジェットの値（ブラウザが送るものと同じ）"""
+        from streamlit.proto.WidgetStates_pb2 import WidgetStates
+
+        states = WidgetStates()
+        for widget_id in self._visible():
+            states.widgets.append(self._widgets[widget_id])
+        return states
+
+    def _act(self, action):
+        widget_id = self._find(action)
+        if widget_id is None:
+            return
+        state = self._widgets[widget_id]
+        if action == "unit":
+            state.string_value = "Fahrenheit" if state.string_value == "Celsius" else "Celsius"
+        elif action == "hours":
+            state.string_array_value.data[:] = [str(self.random.choice([24, 48, 72, 120]))]
+        elif action in ("detail", "auto_refresh"):
+            state.bool_value = not state.bool_value
+        elif action == "city":
+            location = self._find("location")
+            if location is not None:
+                self._widgets[location].bool_value = False
+            state.string_value = self.random.choice(CITIES)
+        # フラグメント内のウィジェットならそのフラグメントだけを再実行する（ブラウザと同じ）
+        self._rerun(self._widget_states(), self._fragments.get(widget_id, ""))
+
+    def _auto_rerun_due(self):
+        """自動更新のフラグメント（run_every）の時刻になっていれば実行する"""
+        if not self._auto_reruns:
+            return False
+        now = time.monotonic()
+        interval = self.auto_rerun_interval or min(self._auto_reruns.values())
+        if now - self._last_auto_rerun < interval:
+            return False
+        self._last_auto_rerun = now
+        for fragment_id in list(self._auto_reruns):
+            self._rerun(self._widget_states(), fragment_id, auto=True)
+        return True
+
+    def _rerun(self, widget_states=None, fragment_id="", auto=False):
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+
+        msg = BackMsg()
+        state = msg.rerun_script
+        state.query_string = ""
+        state.page_script_hash = ""
+        if widget_states is not None:
+            state.widget_states.CopyFrom(widget_states)
+        if fragment_id:
+            state.fragment_id = fragment_id
+            state.is_auto_rerun = auto
+        started = time.perf_counter()
+        self._ws.send(msg.SerializeToString())
+        self._receive_until_finished(full=not fragment_id)
+        self.latencies.append((time.perf_counter() - started) * 1000)
+
+    def _receive_until_finished(self, full):
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        if full:
+            self._start_full_run()
+        while True:
+            msg = ForwardMsg()
+            msg.ParseFromString(self._ws.recv(timeout=self.timeout))
+            kind = msg.WhichOneof("type")
+            if kind == "delta":
+                self._record_delta(msg)
+            elif kind == "auto_rerun":
+                self._auto_reruns[msg.auto_rerun.fragment_id] = msg.auto_rerun.interval
+            elif kind == "stop_auto_rerun":
+                self._auto_reruns.clear()
+            elif kind == "new_session" and not msg.new_session.fragment_ids_this_run:
+                # フラグメント内の st.rerun() などで全体の再実行が始まった
+                self._start_full_run()
+            elif kind == "script_finished":
+                if msg.script_finished == ForwardMsg.FINISHED_WITH_COMPILE_ERROR:
+                    self.errors += 1
+                if msg.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                    return
+
+    def _start_full_run(self):
+        """全体の再実行では画面を作り直し、run_every の登録もやり直す（ブラウザと同じ）"""
+        self._deltas.clear()
+        self._auto_reruns.clear()
+
+    def _record_delta(self, msg):
+        path = tuple(msg.metadata.delta_path)
+        self._deltas[path] = msg
+        if msg.delta.HasField("new_element"):
+            element = msg.delta.new_element
+            kind = element.WhichOneof("type")
+            if kind == "exception":
+                self.errors += 1
+            if kind in WIDGET_TYPES:
+                self._record_widget(kind, getattr(element, kind), msg.delta.fragment_id)
+
+    def _record_widget(self, kind, proto, fragment_id):
+        """初めて見たウィジェットは既定値で状態を作る"""
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+        if fragment_id:
+            self._fragments[proto.id] = fragment_id
+        if proto.id in self._widgets:
+            return
+        state = WidgetState(id=proto.id)
+        if kind == "checkbox":
+            state.bool_value = proto.default
+        elif kind == "radio":
+            state.string_value = proto.options[proto.default]
+        elif kind == "slider":
+            state.string_array_value.data[:] = [proto.options[int(index)] for index in proto.default]
+        elif kind == "text_input" and proto.HasField("default"):
+            state.string_value = proto.default
+        self._widgets[proto.id] = state
+        self._labels[proto.id] = proto.label
+
+
+def run_level(server, upstream, sessions, duration, think, timeout, seed, auto_rerun_interval=None):
+    """同時セッション数 sessions で duration 秒だけ負荷をかけ、結果を返す"""
+    workers = [
+        BrowserSession(server.stream_url, seed * 1000 + i, think, timeout, auto_rerun_interval)
+        for i in range(sessions)
+    ]
+    stop = threading.Event()
+    threads = [threading.Thread(target=worker.loop, args=(stop,), daemon=True) for worker in workers]
+    upstream.reset()
+    peak_rss = server.meter.rss_bytes()
+    cpu_started = server.meter.cpu_seconds()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+
+    while time.perf_counter() - started < duration:
+        time.sleep(0.5)
+        rss = server.meter.rss_bytes()
+        if rss is not None:
+            peak_rss = max(peak_rss or 0, rss)
+    stop.set()
+    for thread in threads:
+        thread.join(timeout + 5)
+
+    elapsed = time.perf_counter() - started
+    cpu_finished = server.meter.cpu_seconds()
+    latencies = [value for worker in workers for value in worker.latencies]
+    first_loads = [value for worker in workers for value in worker.first_loads]
+    upstream_calls = sum(upstream.requests.values())
+    return {
+        "sessions": sessions,
+        "first_load_p50_ms": round(percentile(first_loads, 50), 1),
+        "reruns": len(latencies),
+        "reruns_per_second": round(len(latencies) / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 50), 1),
+        "p95_ms": round(percentile(latencies, 95), 1),
+        "p99_ms": round(percentile(latencies, 99), 1),
+        "errors": sum(worker.errors for worker in workers),
+        "cpu_percent": round((cpu_finished - cpu_started) / elapsed * 100, 1) if cpu_started is not None else None,
+        "rss_mb": round(peak_rss / 1024 / 1024, 1) if peak_rss is not None else None,
+        "upstream_requests": upstream_calls,
+        "upstream_per_second": round(upstream_calls / elapsed, 2),
+        "upstream_by_endpoint": dict(upstream.requests),
+    }
+
+
+def run_load_test(levels, duration=20, think=0.5, latency=0.05, error_rate=0.0, timeout=60, seed=0,
+                  auto_rerun_interval=None):
+    upstream = FakeUpstream(latency=latency, error_rate=error_rate, seed=seed).start()
+    workdir = tempfile.mkdtemp(prefix="weather-load-")
+    env = {
+        **upstream.env(),
+        "WEATHER_API_KEY": "load-test",
+        "WEATHER_STORE_PATH": os.path.join(workdir, "weather.sqlite3"),
+        "WEATHERBIT_DAILY_LIMIT": "1000000",
+        "WEATHERBIT_RATE_PER_SECOND": "1000",
+        "WEATHERBIT_BURST": "1000",
+    }
+    server = StreamlitServer(env, timeout=timeout)
+    try:
+        server.wait_ready()
+        return [
+            run_level(server, upstream, sessions, duration, think, timeout, seed + index, auto_rerun_interval)
+            for index, sessions in enumerate(levels)
+        ]
+    finally:
+        server.stop()
+        upstream.stop()
+
+
+def print_report(results):
+    header = (f"{'sessions':>8} {'first ms':>9} {'reruns/s':>9} {'p50ms':>8} {'p95ms':>8} {'p99ms':>8} "
+              f"{'CPU%':>6} {'RSS MB':>7} {'up/s':>6} {'errors':>6}")
+    print(header)
+    print("-" * len(header))
+    for row in results:
+        cpu = f"{row['cpu_percent']:>6.1f}" if row["cpu_percent"] is not None else f"{'-':>6}"
+        rss = f"{row['rss_mb']:>7.1f}" if row["rss_mb"] is not None else f"{'-':>7}"
+        print(
+            f"{row['sessions']:>8} {row['first_load_p50_ms']:>9.1f} {row['reruns_per_second']:>9.2f} {row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} "
+            f"{row['p99_ms']:>8.1f} {cpu} {rss} {row['upstream_per_second']:>6.2f} {row['errors']:>6}"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="同時セッション数ごとのダッシュボードの処理能力を測る")
+    parser.add_argument("--sessions", default="1,2,4,8", help="同時セッション数（カンマ区切り）")
+    parser.add_argument("--duration", type=float, default=20, help="各段階で負荷をかける秒数")
+    parser.add_argument("--think", type=float, default=0.5, help="操作の間隔の平均（秒）")
+    parser.add_argument("--latency", type=float, default=0.05, help="代替サーバーの応答遅延（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="代替サーバーがエラーを返す割合")
+    parser.add_argument("--auto-rerun-interval", type=float,
+                        help="自動更新のフラグメントを実行する間隔（秒、省略時はアプリの設定どおり）")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="結果をJSONで出力する")
+    args = parser.parse_args(argv)
+
+    levels = [int(value) for value in args.sessions.split(",") if value.strip()]
+    results = run_load_test(
+        levels, args.duration, args.think, args.latency, args.error_rate,
+        seed=args.seed, auto_rerun_interval=args.auto_rerun_interval,
+    )
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_report(results)
+    return 1 if any(row["errors"] for row in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+"""都市リストの天気をまとめて取得し、CSVまたはParquetに書き出すコマンド
+
+使い方:
+    python bulk_export.py cities.txt --out exports --format parquet --concurrency 8
+
+cities.txt は1行に1都市（空行と # で始まる行は無視）。取得が終わった都市から
+順に current / hourly / daily の3ファイルへ追記するので、全件をメモリに溜めない。
+取得結果は画面用の共有キャッシュやディスクストアには入れない。
+WeatherBitの1日の利用枠（WEATHERBIT_DAILY_LIMIT）は画面と共有なので、足りなければ開始時に知らせ、
+枠を使い切った分は他のプロバイダー（Open-Meteo）で取得するかエラーになる。
+"""
+import argparse
+import os
+import sys
+import time
+from collections import Counter
+
+import pandas as pd
+
+from utils.helper_methods import HelperClass
+
+
+class TableSink:
+    """DataFrameを1つのファイルへ順に追記する（CSVまたはParquet）
+
+    Parquet は batch_rows 行たまるごとに1つの行グループとして書く（都市ごとの小さな行グループにしない）。
+    """
+
+    def __init__(self, path, file_format, batch_rows=64 * 1024):
+        self.path = path
+        self.file_format = file_format
+        self.batch_rows = batch_rows
+        self.rows = 0
+        self._writer = None
+        self._schema = None
+        self._pending = []
+        self._pending_rows = 0
+
+    def write(self, frame):
+        if frame.empty:
+            return
+        if self.file_format == "csv":
+            frame.to_csv(self.path, mode="a", header=self.rows == 0, index=False)
+        else:
+            self._pending.append(frame)
+            self._pending_rows += len(frame)
+            if self._pending_rows >= self.batch_rows:
+                self._flush_parquet()
+        self.rows += len(frame)
+
+    def _flush_parquet(self):
+        if not self._pending:
+            return
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("Parquet出力には pyarrow が必要です（pip install pyarrow）")
+        frame = pd.concat(self._pending, ignore_index=True)
+        self._pending, self._pending_rows = [], 0
+        if self._writer is None:
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            self._schema = table.schema
+            self._writer = pq.ParquetWriter(self.path, self._schema)
+        else:
+            table = pa.Table.from_pandas(frame, schema=self._schema, preserve_index=False)
+        self._writer.write_table(table, row_group_size=max(len(frame), 1))
+
+    def close(self):
+        if self.file_format != "csv":
+            self._flush_parquet()
+        if self._writer is not None:
+            self._writer.close()
+
+
+def read_cities(path):
+    """都市リストのファイルを読み込む"""
+    with open(path, encoding="utf-8") as file:
+        lines = (line.strip() for line in file)
+        return [line for line in lines if line and not line.startswith("#")]
+
+
+def result_frames(city, results):
+    """1都市分の結果を current / hourly / daily の DataFrame にする"""
+    frames = {}
+    current = results.get("current")
+    if current is not None and current.ok:
+        frames["current"] = pd.DataFrame([{"query": city, **current.data.to_record()}])
+    for name in ("hourly", "daily"):
+        result = results.get(name)
+        if result is not None and result.ok:
+            frame = result.data.to_frame()
+            frame.insert(0, "query", city)
+            frames[name] = frame
+    return frames
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="都市リストの天気をまとめてCSV/Parquetに書き出す")
+    parser.add_argument("cities", help="1行に1都市を書いたテキストファイル")
+    parser.add_argument("--out", default="exports", help="出力ディレクトリ")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv", dest="file_format")
+    parser.add_argument("--hours", type=int, default=24, help="時間ごとの予報の時間数（1〜120）")
+    parser.add_argument("--no-daily", action="store_true", help="日ごとの予報を取得しない")
+    parser.add_argument("--concurrency", type=int, default=4, help="同時に取得する都市数")
+    args = parser.parse_args(argv)
+
+    cities = read_cities(args.cities)
+    os.makedirs(args.out, exist_ok=True)
+    names = ["current", "hourly"] + ([] if args.no_daily else ["daily"])
+    sinks = {name: TableSink(os.path.join(args.out, f"{name}.{args.file_format}"), args.file_format) for name in names}
+    for sink in sinks.values():
+        if os.path.exists(sink.path):
+            os.remove(sink.path)
+
+    helper = HelperClass()
+    quota = helper.quota_stats()
+    needed = len(cities) * len(names)
+    if needed > quota["remaining_today"]:
+        print(
+            f"注意: WeatherBitの今日の残り枠は{quota['remaining_today']}回（上限{quota['daily_limit']}回）で、"
+            f"{len(cities)}都市の{needed}回分に足りません。足りない分は他のプロバイダーで取得するかエラーになります",
+            file=sys.stderr,
+        )
+    started = time.time()
+    failed = 0
+    providers = Counter()
+    try:
+        for done, (city, results) in enumerate(
+            helper.iter_cities(cities, args.hours, not args.no_daily, args.concurrency, use_cache=False), start=1
+        ):
+            errors = [f"{name}: {result.error}" for name, result in results.items() if not result.ok]
+            providers.update(result.provider or "unknown" for result in results.values() if result.ok)
+            if errors:
+                failed += 1
+                print(f"[{done}/{len(cities)}] {city} 取得エラー ({'; '.join(errors)})", file=sys.stderr)
+            for name, frame in result_frames(city, results).items():
+                sinks[name].write(frame)
+            print(f"[{done}/{len(cities)}] {city}", file=sys.stderr)
+    finally:
+        for sink in sinks.values():
+            sink.close()
+
+    print(
+        f"{len(cities)}都市を{time.time() - started:.1f}秒で処理（エラー {failed}件）: "
+        + ", ".join(f"{sink.path} {sink.rows}行" for sink in sinks.values()),
+        file=sys.stderr,
+    )
+    rejected = helper.quota_stats()["rejected"] - quota["rejected"]
+    print(
+        "取得元: " + ", ".join(f"{name} {count}件" for name, count in providers.most_common())
+        + (f"（WeatherBitの利用枠で断られた呼び出し {rejected}回）" if rejected else ""),
+        file=sys.stderr,
+    )
+    return 1 if failed == len(cities) and cities else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+import pandas as pd
+import streamlit as st
+from utils.geocode import GeocodingUnavailableError
+from utils.helper_methods import HelperClass
+
+st.set_page_config(layout="wide", page_title="WeatherStream Compare", page_icon="🏙️")
+
+# --- Initialize Helper Class || ヘルパークラスの初期化 ---
+helper = HelperClass()
+
+COMPARE_HOURS = 48  # hours of hourly forecast to compare || 比較する時間ごとの予報の時間数
+MAX_CITIES = 12
+
+# --- Sidebar || サイドバー ---
+with st.sidebar:
+    cities_input = st.text_area("🏙️ Cities (one per line or comma separated):", value="Tokyo\nOsaka\nLondon", key="compare_cities")
+    use_celsius = st.radio("🌡️ Temperature Unit", ["Celsius", "Fahrenheit"], index=0, key="compare_unit")
+    hours_to_show = st.select_slider("⏱️ Hours", options=[12, 24, 48], value=24, key="compare_hours")
+
+# Split and de-duplicate city names (case-insensitive) || 都市名を分割し重複を除く
+cities = []
+for name in cities_input.replace(",", "\n").splitlines():
+    name = " ".join(name.split())
+    if name and name.casefold() not in {city.casefold() for city in cities}:
+        cities.append(name)
+cities = cities[:MAX_CITIES]
+
+# Skip names that don't resolve to a place (typos etc.) or can't be looked up right now || 場所に解決できない・今は調べられない都市名は取得しない
+places, unknown, unavailable = {}, [], []
+for city in cities:
+    try:
+        place = helper.resolve_place(city)
+    except GeocodingUnavailableError:
+        unavailable.append(city)
+        continue
+    if place is None:
+        unknown.append(city)
+    else:
+        places[city] = place
+cities = [city for city in cities if city in places]
+
+st.title("🏙️ City Comparison")
+if unknown:
+    st.warning(f"🔎 Unknown cities skipped: {', '.join(unknown)}")
+if unavailable:
+    st.warning(f"🛰️ Location lookup service is unavailable right now — skipped: {', '.join(unavailable)}")
+if not cities:
+    st.info("🌟 Enter at least one city to compare")
+    st.stop()
+
+# --- Fetch All Cities Concurrently || 全都市を並行取得 ---
+with st.spinner(f"🌤️ Fetching weather for {len(cities)} cities..."):
+    results = helper.fetch_cities(cities, hours=COMPARE_HOURS, include_daily=False, concurrency=len(cities), places=places)
+
+failed = [city for city in cities if not results[city]["current"].ok and not results[city]["hourly"].ok]
+if failed:
+    st.warning(f"⚠️ No data for: {', '.join(failed)}")
+
+unit_label = 'C' if use_celsius == 'Celsius' else 'F'
+
+# --- Aligned Hourly Series || 時刻をそろえた時間ごとの系列 ---
+# Forecasts may come from different fetches, so align on UTC time, not row number || 都市ごとに取得時刻が違うことがあるので、行番号ではなくUTCの時刻でそろえる
+forecasts = {city: results[city]["hourly"].data for city in cities if results[city]["hourly"].ok}
+chart = helper.align_hourly_temperatures(forecasts, hours_to_show, use_celsius)
+if not chart.empty:
+    st.subheader(f"🌡️ Hourly Temperature (°{unit_label})")
+    st.line_chart(chart)
+else:
+    st.info("No hourly forecast data available")
+
+# --- Current Metrics Table || 現在の指標の表 ---
+current = [(city, results[city]["current"].data) for city in cities if results[city]["current"].ok]
+if current:
+    table = pd.DataFrame({
+        "City": [weather.city_name or city for city, weather in current],
+        "Country": [weather.country_code for _, weather in current],
+        "Conditions": [weather.description for _, weather in current],
+        f"Temp (°{unit_label})": helper.convert_temperature_series([weather.temp for _, weather in current], use_celsius),
+        f"Feels Like (°{unit_label})": helper.convert_temperature_series([weather.app_temp for _, weather in current], use_celsius),
+        "Humidity (%)": [weather.rh for _, weather in current],
+        "Wind (m/s)": [weather.wind_spd for _, weather in current],
+        "Pressure (mb)": [weather.pres for _, weather in current],
+        "UV": [weather.uv for _, weather in current],
+    })
+    st.subheader("📊 Current Conditions")
+    st.dataframe(table, hide_index=True)
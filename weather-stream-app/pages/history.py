@@ -0,0 +1,69 @@
+import pandas as pd
+import streamlit as st
+from utils.geocode import GeocodingUnavailableError
+from utils.helper_methods import HelperClass
+from utils.history import choose_resolution
+
+st.set_page_config(layout="wide", page_title="WeatherStream History", page_icon="📜")
+
+# --- Initialize Helper Class || ヘルパークラスの初期化 ---
+helper = HelperClass()
+
+# Range label -> days; longer ranges read coarser rollups || 表示期間（日数）。長いほど粗い集計を読む
+HISTORY_RANGES = {"24 hours": 1, "2 days": 2, "7 days": 7, "14 days": 14, "30 days": 30, "90 days": 90, "1 year": 365}
+# Metric label -> (column, is temperature) || 指標と列名（温度なら単位を変換する）
+HISTORY_METRICS = {
+    "🌡️ Temperature": ("temp", True),
+    "🤗 Feels Like": ("app_temp", True),
+    "💧 Humidity (%)": ("rh", False),
+    "🔵 Pressure (mb)": ("pres", False),
+    "💨 Wind (m/s)": ("wind_spd", False),
+}
+
+# --- Sidebar || サイドバー ---
+with st.sidebar:
+    city = st.text_input("🌍 City:", value="Tokyo", key="history_city")
+    range_label = st.select_slider("🗓️ Range", options=list(HISTORY_RANGES), value="7 days", key="history_range")
+    metric_label = st.selectbox("📈 Metric", list(HISTORY_METRICS), key="history_metric")
+    use_celsius = st.radio("🌡️ Temperature Unit", ["Celsius", "Fahrenheit"], index=0, key="history_unit")
+
+st.title("📜 Observed History")
+if not city:
+    st.info("🌟 Enter a city to see its observed history")
+    st.stop()
+try:
+    place = helper.resolve_place(city)
+except GeocodingUnavailableError:
+    st.warning(f"🛰️ Couldn't look up **{city}** — the location lookup service is unavailable right now, try again shortly")
+    st.stop()
+if place is None:
+    suggestions = helper.suggest_cities(city)
+    st.warning(f"🔎 Unknown city: **{city}**" + (f" — did you mean {', '.join(suggestions[:3])}?" if suggestions else ""))
+    st.stop()
+
+# --- Read History || 履歴の読み出し ---
+days = HISTORY_RANGES[range_label]
+column, is_temperature = HISTORY_METRICS[metric_label]
+history = helper.weather_history(city, days, place=place)
+if history.empty:
+    st.info(f"No observations recorded for **{city}** in the last {range_label} yet — history builds up as the dashboard fetches weather")
+    st.stop()
+
+# Raw snapshots have one column; rollups have min/mean/max || 生データは1列、集計は最小・平均・最大
+if "ts" in history:
+    resolution = "raw snapshots"
+    chart = pd.DataFrame({"observed": history[column].to_numpy()}, index=pd.DatetimeIndex(history["ts"], name="Time (UTC)"))
+else:
+    resolution = f"{choose_resolution(days)} rollups"
+    chart = pd.DataFrame(
+        {stat: history[f"{column}_{stat}"].to_numpy() for stat in ("min", "mean", "max")},
+        index=pd.DatetimeIndex(history["bucket"], name="Time (UTC)"),
+    )
+if is_temperature:
+    unit_label = 'C' if use_celsius == 'Celsius' else 'F'
+    chart = chart.apply(lambda series: helper.convert_temperature_series(series.to_numpy(), use_celsius))
+    metric_label = f"{metric_label} (°{unit_label})"
+
+st.subheader(f"{metric_label} — last {range_label}")
+st.line_chart(chart)
+st.caption(f"{len(history)} rows read from {resolution}")
@@ -0,0 +1,9 @@
+import os
+import sys
+import tempfile
+
+# テストは weather-stream-app をカレントにしなくても utils をimportできるようにする
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# helper_methods をimportするテストが開発用の .cache（ストア・履歴・利用回数）に書かないようにする
+os.environ.setdefault("WEATHER_STORE_PATH", os.path.join(tempfile.mkdtemp(prefix="weather-tests-"), "weather.sqlite3"))
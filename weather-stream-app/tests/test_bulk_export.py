@@ -0,0 +1,29 @@
+import pandas as pd
+import pytest
+
+pq = pytest.importorskip("pyarrow.parquet")
+
+from bulk_export import TableSink  # noqa: E402
+
+
+def _frame(city, rows):
+    return pd.DataFrame({"query": [city] * rows, "temp": [float(i) for i in range(rows)]})
+
+
+def test_parquet_rows_are_batched_into_few_row_groups(tmp_path):
+    sink = TableSink(str(tmp_path / "hourly.parquet"), "parquet", batch_rows=100)
+    for index in range(30):
+        sink.write(_frame(f"city{index}", 24))
+    sink.close()
+    file = pq.ParquetFile(sink.path)
+    assert file.metadata.num_rows == sink.rows == 720
+    # 100行を超えるたび（5都市 = 120行ごと）に1つの行グループにする（都市ごとに30個にはしない）
+    assert file.num_row_groups == 6
+
+
+def test_csv_is_written_per_city(tmp_path):
+    sink = TableSink(str(tmp_path / "current.csv"), "csv")
+    sink.write(_frame("a", 1))
+    sink.write(_frame("b", 2))
+    sink.close()
+    assert list(pd.read_csv(sink.path)["query"]) == ["a", "b", "b"]
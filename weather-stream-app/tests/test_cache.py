@@ -0,0 +1,111 @@
+import threading
+
+import pytest
+
+from utils import cache as cache_module
+from utils.cache import TTLCache, normalize_city
+
+
+class FakeClock:
+    """time.time() の代わり（テストから時刻を進める）"""
+
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(cache_module.time, "time", fake)
+    return fake
+
+
+class Loader:
+    def __init__(self, *values):
+        self.values = list(values)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.values.pop(0)
+
+
+def test_normalize_city():
+    assert normalize_city("  New   York ") == normalize_city("new york") == "new york"
+
+
+def test_fresh_value_is_returned_without_loading(clock):
+    cache = TTLCache()
+    loader = Loader("a", "b")
+    assert cache.get_or_load("k", loader, ttl=10) == "a"
+    clock.now += 10
+    assert cache.get_or_load("k", loader, ttl=10) == "a"
+    assert loader.calls == 1
+    assert cache.stats()["hits"] == 1
+
+
+def test_expired_value_without_grace_is_reloaded(clock):
+    cache = TTLCache()
+    loader = Loader("a", "b")
+    cache.get_or_load("k", loader, ttl=10)
+    clock.now += 11
+    assert cache.get_or_load("k", loader, ttl=10) == "b"
+    assert cache.stats()["misses"] == 2
+
+
+def test_stale_value_is_served_while_revalidating(clock):
+    cache = TTLCache()
+    cache.get_or_load("k", Loader("old"), ttl=10, max_stale=30)
+    clock.now += 20
+    refreshed = threading.Event()
+
+    def loader():
+        refreshed.set()
+        return "new"
+
+    assert cache.get_or_load("k", loader, ttl=10, max_stale=30) == "old"
+    assert refreshed.wait(5)
+    for _ in range(100):
+        if cache.peek("k") == "new":
+            break
+        threading.Event().wait(0.01)
+    assert cache.peek("k") == "new"
+    assert cache.stats()["stale_hits"] == 1
+
+
+def test_value_past_grace_is_reloaded_in_the_foreground(clock):
+    cache = TTLCache()
+    cache.get_or_load("k", Loader("old"), ttl=10, max_stale=30)
+    clock.now += 41
+    assert cache.get_or_load("k", Loader("new"), ttl=10, max_stale=30) == "new"
+
+
+def test_uncacheable_values_are_not_stored(clock):
+    cache = TTLCache()
+    loader = Loader(None, "a")
+    assert cache.get_or_load("k", loader, ttl=10, cacheable=bool) is None
+    assert cache.get_or_load("k", loader, ttl=10, cacheable=bool) == "a"
+    assert loader.calls == 2
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = TTLCache(maxsize=2)
+    cache.set("a", 1, ttl=10)
+    cache.set("b", 2, ttl=10)
+    cache.get_or_load("a", Loader(), ttl=10)  # a を最近使ったことにする
+    cache.set("c", 3, ttl=10)
+    assert cache.peek("b") is None
+    assert (cache.peek("a"), cache.peek("c")) == (1, 3)
+    assert cache.stats()["evictions"] == 1
+
+
+def test_age_and_invalidate(clock):
+    cache = TTLCache()
+    cache.set("k", 1, ttl=10)
+    clock.now += 4
+    assert cache.age("k") == 4
+    cache.invalidate("k")
+    assert cache.age("k") is None
@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+
+from utils.helper_methods import HelperClass
+from utils.models import HourlyForecast
+
+START = pd.Timestamp("2024-01-01 10:00")
+
+
+def forecast(first_utc, temps, missing=()):
+    """first_utc から1時間ごとの予報（missing の行は UTC の時刻なし）"""
+    items = [
+        {
+            "timestamp_local": f"2024-01-01T{hour:02d}:00:00",
+            "timestamp_utc": None if index in missing else str(pd.Timestamp(first_utc) + pd.Timedelta(hours=index)),
+            "temp": temp,
+        }
+        for index, (hour, temp) in enumerate(zip(range(len(temps)), temps))
+    ]
+    return HourlyForecast.from_json({"city_name": "", "data": items})
+
+
+def test_cities_are_aligned_on_utc_time_not_row_number():
+    forecasts = {
+        # 1時間前に取得した予報は最初の行が1時間早い
+        "Tokyo": forecast("2024-01-01 09:00", [1.0, 2.0, 3.0, 4.0]),
+        "London": forecast("2024-01-01 10:00", [10.0, 20.0, 30.0]),
+    }
+    chart = HelperClass().align_hourly_temperatures(forecasts, 3, start=START)
+    assert list(chart.index) == list(pd.date_range(START, periods=3, freq="h"))
+    assert chart["Tokyo"].tolist() == [2.0, 3.0, 4.0]
+    assert chart["London"].tolist() == [10.0, 20.0, 30.0]
+
+
+def test_rows_outside_the_range_or_without_utc_time_are_gaps():
+    forecasts = {"Osaka": forecast("2024-01-01 10:00", [1.0, 2.0], missing=(1,))}
+    chart = HelperClass().align_hourly_temperatures(forecasts, 3, to_unit="Fahrenheit", start=START)
+    assert chart["Osaka"].iloc[0] == 33.8
+    assert np.isnan(chart["Osaka"].iloc[1:]).all()
+
+
+def test_no_usable_forecast_gives_empty_frame():
+    forecasts = {"Nowhere": forecast("2024-01-01 10:00", [1.0], missing=(0,))}
+    assert HelperClass().align_hourly_temperatures(forecasts, 3, start=START).empty
@@ -0,0 +1,63 @@
+import pytest
+
+from utils.gazetteer import Gazetteer, normalize_name, split_country
+
+CITIES = """\
+# name	country_code	latitude	longitude	population	alternate_names
+Portland	US	45.5152	-122.6784	650000
+Portland	US	43.6591	-70.2568	68000	Portland ME
+Paris	FR	48.8566	2.3522	2100000
+Paris	US	33.6609	-95.5555	25000
+Parma	IT	44.8015	10.3279	195000
+São Paulo	BR	-23.5505	-46.6333	12300000	Sao Paulo|サンパウロ
+Tokyo	JP	35.6895	139.6917	13960000	東京
+broken line
+"""
+
+
+@pytest.fixture
+def gazetteer(tmp_path):
+    path = tmp_path / "cities.tsv"
+    path.write_text(CITIES, encoding="utf-8")
+    return Gazetteer(str(path))
+
+
+def test_normalize_name():
+    assert normalize_name("São  Paulo") == "sao paulo"
+    assert normalize_name("Xi'an") == "xian"
+    assert normalize_name("Rostov-on-Don") == "rostov on don"
+
+
+def test_split_country():
+    assert split_country("Paris, fr") == ("paris", "FR")
+    assert split_country("Paris") == ("paris", None)
+
+
+def test_lookup_prefers_larger_city_and_respects_country(gazetteer):
+    assert gazetteer.lookup("portland").latitude == 45.5152
+    assert gazetteer.lookup("Paris, US").country_code == "US"
+    assert gazetteer.lookup("Portland, JP") is None
+
+
+def test_lookup_matches_aliases_exactly(gazetteer):
+    assert gazetteer.lookup("サンパウロ").name == "São Paulo"
+    assert gazetteer.lookup("sao paulo").name == "São Paulo"
+    assert gazetteer.lookup("Par") is None
+
+
+def test_suggest_by_prefix_in_population_order(gazetteer):
+    assert gazetteer.suggest("par") == ["Paris, FR", "Parma, IT", "Paris, US"]
+    assert gazetteer.suggest("Par", limit=1) == ["Paris, FR"]
+    assert gazetteer.suggest("pa, US") == ["Paris, US"]
+
+
+def test_suggest_falls_back_to_close_spellings(gazetteer):
+    assert gazetteer.suggest("Tokio") == ["Tokyo, JP"]
+    assert gazetteer.suggest("") == []
+
+
+def test_loads_lazily_and_skips_bad_rows(gazetteer):
+    assert gazetteer.stats()["loaded"] is False
+    gazetteer.lookup("Tokyo")
+    stats = gazetteer.stats()
+    assert (stats["loaded"], stats["cities"]) == (True, 7)
@@ -0,0 +1,67 @@
+import pytest
+
+from utils.geocode import GeocodingTable, GeocodingUnavailableError, Place, geohash_bounds, geohash_center, geohash_encode
+
+
+def test_geohash_encode_known_values():
+    assert geohash_encode(35.6895, 139.6917, 5) == "xn774"
+    assert geohash_encode(57.64911, 10.40744, 11) == "u4pruydqqvj"
+
+
+def test_geohash_bounds_contain_point():
+    south, north, west, east = geohash_bounds("xn774")
+    assert south <= 35.6895 <= north and west <= 139.6917 <= east
+    latitude, longitude = geohash_center("xn774")
+    assert geohash_encode(latitude, longitude, 5) == "xn774"
+
+
+def test_nearby_places_share_a_cell():
+    assert Place("Tokyo", "JP", 35.6895, 139.6917).cell(5) == Place("東京", "JP", 35.6900, 139.6920).cell(5)
+
+
+class FlakyLookup:
+    """失敗を返す外部ジオコーディングの代わり（呼び出し回数を数える）"""
+
+    def __init__(self):
+        self.calls = 0
+        self.place = None
+        self.down = True
+
+    def __call__(self, city):
+        self.calls += 1
+        if self.down:
+            raise TimeoutError("down")
+        return self.place
+
+
+def test_lookup_error_is_not_reported_as_not_found():
+    lookup = FlakyLookup()
+    table = GeocodingTable(lookup, ":memory:", error_ttl=60)
+    with pytest.raises(GeocodingUnavailableError):
+        table.resolve("Smallville")
+    # 障害のあいだは問い合わせずに同じ例外を返す
+    with pytest.raises(GeocodingUnavailableError):
+        table.resolve("smallville ")
+    assert lookup.calls == 1
+    assert table.stats()["backed_off"] == 1
+
+
+def test_lookup_recovers_after_error_ttl():
+    lookup = FlakyLookup()
+    table = GeocodingTable(lookup, ":memory:", error_ttl=0)
+    with pytest.raises(GeocodingUnavailableError):
+        table.resolve("Smallville")
+    lookup.down = False
+    lookup.place = Place("Smallville", "US", 39.0, -95.0)
+    assert table.resolve("Smallville") == lookup.place
+    assert table.resolve("SMALLVILLE") == lookup.place
+    assert lookup.calls == 2
+
+
+def test_not_found_returns_none_and_is_remembered():
+    lookup = FlakyLookup()
+    lookup.down = False
+    table = GeocodingTable(lookup, ":memory:", not_found_ttl=60)
+    assert table.resolve("Xqzzy") is None
+    assert table.resolve("xqzzy") is None
+    assert lookup.calls == 1
@@ -0,0 +1,90 @@
+import os
+import threading
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyarrow.parquet")
+
+from utils.history import HistoryStore  # noqa: E402
+from utils.models import CurrentWeather, WeatherResult  # noqa: E402
+
+NOW = pd.Timestamp("2024-05-10 12:30", tz="UTC")
+
+
+def observation(index, temp):
+    weather = CurrentWeather(
+        city_name="Tokyo", country_code="JP", description="", icon="", observed_at=str(index),
+        temp=temp, app_temp=temp, dewpt=None, rh=50.0, clouds=0.0, uv=1.0, vis=10.0, pres=1010.0,
+        wind_spd=None, wind_cdir_full="", sunrise="", sunset="",
+    )
+    return WeatherResult(data=weather, provider="weatherbit")
+
+
+def record(store, index, temp, at):
+    store._record("gh:xn774", observation(index, temp), at.timestamp())
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = HistoryStore(str(tmp_path), rollup_flush_seconds=float("inf"))
+    store._compacted_day = pd.Timestamp.now(tz="UTC").strftime("%Y-%m-%d")  # まとめ直しは個別に試す
+    return store
+
+
+def touch(directory, name):
+    path = os.path.join(directory, name)
+    open(path, "w").close()
+    return path
+
+
+def test_day_parts_skips_parts_covered_by_compacted_file(tmp_path):
+    directory = str(tmp_path)
+    old = touch(directory, "part-100-aaaa.parquet")
+    compacted = touch(directory, "part-200-compacted.parquet")
+    covered = touch(directory, "part-200-bbbb.parquet")
+    newer = touch(directory, "part-300-cccc.parquet")
+    touch(directory, ".part-400-dddd.parquet.1234.tmp")
+    touch(directory, "part-oops.parquet")
+    live, superseded = HistoryStore._day_parts(directory)
+    assert live == [compacted, newer]
+    assert sorted(superseded) == sorted([old, covered])
+
+
+def test_day_parts_without_compacted_file(tmp_path):
+    directory = str(tmp_path)
+    parts = [touch(directory, f"part-{ns}-x.parquet") for ns in (3, 1, 2)]
+    assert HistoryStore._day_parts(directory) == (sorted(parts), [])
+
+
+def test_open_bucket_is_read_before_it_is_written(store):
+    record(store, 1, 10.0, NOW)
+    record(store, 2, 20.0, NOW + pd.Timedelta(minutes=10))
+    assert not os.path.exists(store._path("rollup_hourly", "gh:xn774", "date=2024-05-10.parquet"))
+    hourly = store.read("gh:xn774", 7, "hourly", now=NOW)
+    assert hourly[["temp_min", "temp_mean", "temp_max"]].iloc[0].tolist() == [10.0, 15.0, 20.0]
+
+
+def test_closed_bucket_is_written_and_merged(store):
+    record(store, 1, 10.0, NOW)
+    store.flush()  # 途中でファイルに書いても、同じ bucket の続きは足し合わせる
+    record(store, 2, 20.0, NOW + pd.Timedelta(minutes=10))
+    record(store, 3, 30.0, NOW + pd.Timedelta(hours=1))
+    path = store._path("rollup_hourly", "gh:xn774", "date=2024-05-10.parquet")
+    written = pd.read_parquet(path)
+    assert written["temp_count"].tolist() == [2]
+    later = NOW + pd.Timedelta(hours=2)
+    hourly = store.read("gh:xn774", 7, "hourly", now=later)
+    assert hourly["temp_mean"].tolist() == [15.0, 30.0]
+    daily = store.read("gh:xn774", 30, "daily", now=later)
+    assert daily[["temp_min", "temp_mean", "temp_max"]].iloc[0].tolist() == [10.0, 20.0, 30.0]
+
+
+def test_compaction_runs_off_the_writer_thread(tmp_path):
+    store = HistoryStore(str(tmp_path))
+    threads = []
+    store.compact = lambda before=None: threads.append(threading.current_thread().name)
+    record(store, 1, 10.0, NOW)
+    store.flush()
+    store._compaction_pool.shutdown(wait=True)
+    assert threads and threads[0].startswith("weather-history-compact")
@@ -0,0 +1,29 @@
+from urllib3.response import HTTPResponse
+
+from utils.http_client import MAX_RETRY_AFTER, _build_retry
+
+
+def _response(retry_after):
+    return HTTPResponse(status=429, headers={"Retry-After": retry_after}, preload_content=False)
+
+
+def test_retry_after_is_capped():
+    retry = _build_retry()
+    assert retry.get_retry_after(_response("600")) == MAX_RETRY_AFTER
+
+
+def test_short_retry_after_is_kept():
+    retry = _build_retry()
+    assert retry.get_retry_after(_response("2")) == 2
+
+
+def test_cap_survives_increment():
+    # urllib3 はリトライのたびに new() で作り直すので、上限が引き継がれること
+    retry = _build_retry().increment(method="GET", url="/", response=_response("600"))
+    assert retry.get_retry_after(_response("600")) == MAX_RETRY_AFTER
+
+
+def test_metered_adapter_does_not_retry_statuses():
+    retry = _build_retry(read=0, status_forcelist=())
+    assert not retry.is_retry("GET", 429, has_retry_after=True)
+    assert not retry.respect_retry_after_header
@@ -0,0 +1,52 @@
+import pytest
+
+from utils import helper_methods
+from utils.helper_methods import HelperClass
+
+
+class FakeResponse:
+    def __init__(self, payload):
+        self.payload = payload
+
+    def json(self):
+        return self.payload
+
+
+@pytest.fixture
+def ipinfo(monkeypatch):
+    """ipify / ipinfo の代わり（ipinfo の応答を差し替えられる）"""
+    payload = {"region": "Kanto Region", "country": "JP", "loc": "35.44,139.64"}
+    calls = []
+
+    def get(self, service, url, endpoint="", **kwargs):
+        calls.append(service)
+        return FakeResponse({"ip": "203.0.113.7"} if service == "ipify" else payload)
+
+    monkeypatch.setattr(HelperClass, "_get", get)
+    monkeypatch.setattr(helper_methods, "ip_database", None)
+    helper_methods.location_cache.invalidate()
+    yield payload, calls
+    helper_methods.location_cache.invalidate()
+
+
+def test_detection_returns_region_and_place(ipinfo):
+    _, calls = ipinfo
+    region, place = HelperClass().take_user_location()
+    assert region == "Kanto Region"
+    assert (place.latitude, place.longitude) == (35.44, 139.64)
+    # IPごとにキャッシュする
+    assert HelperClass().take_user_location() == (region, place)
+    assert calls == ["ipify", "ipinfo"]
+
+
+def test_detected_place_is_not_a_global_name_override(ipinfo, monkeypatch):
+    HelperClass().take_user_location()
+    monkeypatch.setattr(helper_methods.geocoding_table, "lookup", lambda city: None)
+    # 他の利用者が同じ地域名を入力しても、検出した座標は使われない
+    assert HelperClass().resolve_place("Kanto Region") is None
+
+
+def test_detection_without_coordinates(ipinfo):
+    payload, _ = ipinfo
+    del payload["loc"]
+    assert HelperClass().take_user_location() == ("Kanto Region", None)
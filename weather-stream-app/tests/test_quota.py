@@ -0,0 +1,93 @@
+import datetime
+import threading
+
+import pytest
+
+from utils.quota import DailyBudget, QuotaExceededError, QuotaManager, TokenBucket
+from utils.store import UsageLedger
+
+
+class FakeDay:
+    """DailyBudget._today() を差し替えて日付を進める"""
+
+    def __init__(self):
+        # UsageLedger は古い日の行を消すので、今日から始める
+        self.day = datetime.datetime.now(datetime.timezone.utc).date()
+
+    def __call__(self):
+        return self.day
+
+
+@pytest.fixture
+def today(monkeypatch):
+    fake = FakeDay()
+    monkeypatch.setattr(DailyBudget, "_today", staticmethod(fake))
+    return fake
+
+
+def test_budget_stops_at_limit(today):
+    budget = DailyBudget(2)
+    assert budget.consume() and budget.consume()
+    assert not budget.consume()
+    assert budget.used == 2 and budget.remaining == 0
+
+
+def test_budget_rolls_over_at_utc_midnight(today):
+    budget = DailyBudget(1)
+    assert budget.consume()
+    today.day += datetime.timedelta(days=1)
+    assert budget.remaining == 1
+    assert budget.consume()
+
+
+def test_ledger_budget_survives_restart(tmp_path, today):
+    path = str(tmp_path / "store.sqlite3")
+    first = DailyBudget(3, UsageLedger(path))
+    assert first.consume() and first.consume()
+    # 再起動（別のプロセス）でも同じ日の回数を引き継ぐ
+    second = DailyBudget(3, UsageLedger(path))
+    assert second.used == 2
+    assert second.consume()
+    assert not second.consume()
+    assert not first.consume()
+
+
+def test_ledger_budget_rolls_over(tmp_path, today):
+    budget = DailyBudget(1, UsageLedger(str(tmp_path / "store.sqlite3")))
+    assert budget.consume() and not budget.consume()
+    today.day += datetime.timedelta(days=1)
+    assert budget.used == 0
+    assert budget.consume()
+
+
+def test_ledger_never_exceeds_limit_under_concurrency(tmp_path, today):
+    path = str(tmp_path / "store.sqlite3")
+    budgets = [DailyBudget(25, UsageLedger(path)) for _ in range(4)]
+    granted = []
+
+    def worker(budget):
+        granted.extend(budget.consume() for _ in range(20))
+
+    threads = [threading.Thread(target=worker, args=(budget,)) for budget in budgets]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sum(granted) == 25
+    assert UsageLedger(path).used(today.day.isoformat()) == 25
+
+
+def test_quota_manager_counts_rejections(today):
+    quota = QuotaManager(daily_limit=1, rate_per_second=100, burst=10)
+    quota.acquire()
+    with pytest.raises(QuotaExceededError):
+        quota.acquire()
+    assert quota.stats()["rejected"] == 1
+    assert quota.ttl_multiplier() == QuotaManager.TTL_STEPS[-1][1]
+
+
+def test_token_bucket_gives_up_after_timeout():
+    bucket = TokenBucket(rate=1, capacity=1)
+    assert bucket.acquire(timeout=0)
+    assert not bucket.acquire(timeout=0.01)
+    assert bucket.throttled == 1
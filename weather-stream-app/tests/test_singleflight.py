@@ -0,0 +1,64 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from utils.singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "result"
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        leader = pool.submit(flight.do, "k", slow)
+        assert started.wait(5)
+        followers = [pool.submit(flight.do, "k", slow) for _ in range(7)]
+        # 待っている呼び出しがそろってから結果を返す
+        while flight.stats()["shared"] < 7:
+            threading.Event().wait(0.01)
+        release.set()
+        results = [leader.result(5)] + [future.result(5) for future in followers]
+
+    assert results == ["result"] * 8
+    assert len(calls) == 1
+    assert flight.stats() == {"executed": 1, "shared": 7, "in_flight": 0}
+
+
+def test_errors_reach_every_waiter_and_are_not_remembered():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+
+    def failing():
+        started.set()
+        release.wait(5)
+        raise TimeoutError("upstream")
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        leader = pool.submit(flight.do, "k", failing)
+        assert started.wait(5)
+        follower = pool.submit(flight.do, "k", failing)
+        while flight.stats()["shared"] < 1:
+            threading.Event().wait(0.01)
+        release.set()
+        for future in (leader, follower):
+            with pytest.raises(TimeoutError):
+                future.result(5)
+
+    # 次の呼び出しは新しく実行する
+    assert flight.do("k", lambda: "ok") == "ok"
+    assert flight.stats()["executed"] == 2
+
+
+def test_different_keys_run_separately():
+    flight = SingleFlight()
+    assert flight.do("a", lambda: 1) == 1
+    assert flight.do("b", lambda: 2) == 2
+    assert flight.stats()["executed"] == 2
@@ -0,0 +1,86 @@
+import base64
+import mimetypes
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+MIME_TYPES = {
+    ".svg": "image/svg+xml",
+    ".gif": "image/gif",
+    ".png": "image/png",
+    ".webp": "image/webp",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+}
+
+
+def minify_svg(text):
+    """SVGからコメントとタグ間の空白を取り除く"""
+    text = re.sub(r"<!--.*?-->", "", text, flags=re.DOTALL)
+    text = re.sub(r">\s+<", "><", text)
+    text = re.sub(r"\s{2,}", " ", text)
+    return text.strip()
+
+
+class AssetRegistry:
+    """ローカルのアイコンを一度だけ読み込んでdata URLにし、メモリに保持する
+
+    保持する合計サイズは max_bytes まで（超えたら最も古く使われたものから削除）。
+    ファイルの更新時刻は check_interval 秒ごとにだけ確認し、変わっていれば読み直す。
+    """
+
+    def __init__(self, max_bytes=8 * 1024 * 1024, check_interval=5.0):
+        self.max_bytes = max_bytes
+        self.check_interval = check_interval
+        self._entries = OrderedDict()  # (path, minify) -> [data_url, mtime, checked_at]
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.loads = 0
+
+    def data_url(self, path, minify=True):
+        """ファイルをdata URLで返す（2回目以降はメモリから）"""
+        key = (os.path.abspath(path), minify)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if now - entry[2] < self.check_interval:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                if os.path.getmtime(key[0]) == entry[1]:
+                    entry[2] = now
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+
+        mtime = os.path.getmtime(key[0])
+        url = self._encode(key[0], minify)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old[0])
+            self._entries[key] = [url, mtime, now]
+            self._size += len(url)
+            self.loads += 1
+            while self._size > self.max_bytes and len(self._entries) > 1:
+                _, (evicted, _, _) = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+        return url
+
+    def _encode(self, path, minify):
+        ext = os.path.splitext(path)[1].lower()
+        mime = MIME_TYPES.get(ext) or mimetypes.guess_type(path)[0] or "application/octet-stream"
+        with open(path, "rb") as file:
+            contents = file.read()
+        if minify and ext == ".svg":
+            contents = minify_svg(contents.decode("utf-8")).encode("utf-8")
+        return f"data:{mime};base64,{base64.b64encode(contents).decode('utf-8')}"
+
+    def stats(self):
+        """保持件数・サイズ・ヒット数を返す"""
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._size, "hits": self.hits, "loads": self.loads}
@@ -0,0 +1,124 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger("weather.cache")
+
+
+def normalize_city(city):
+    """キャッシュキー用に都市名を正規化（前後の空白・大文字小文字を無視）"""
+    return " ".join(str(city).split()).casefold()
+
+
+class TTLCache:
+    """プロセス全体で共有するTTL付きLRUキャッシュ
+
+    期限切れ（stale）のデータは max_stale 秒まで返しつつ、
+    バックグラウンドで再取得して差し替える。
+    """
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._data = OrderedDict()  # key -> (value, fetched_at, ttl, max_stale)
+        self._lock = threading.RLock()
+        self._refreshing = set()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.refresh_errors = 0
+
+    def get_or_load(self, key, loader, ttl, max_stale=0, cacheable=None):
+        """キャッシュから値を返し、なければ loader() を呼んで保存
+
+        cacheable(value) が False を返した値（エラー結果など）は保存しない。
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, fetched_at, _, _ = entry
+                age = now - fetched_at
+                if age <= ttl:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                if age <= ttl + max_stale:
+                    # 古いデータを返しつつ裏で更新
+                    self._data.move_to_end(key)
+                    self.stale_hits += 1
+                    self._refresh_in_background(key, loader, ttl, max_stale, cacheable)
+                    return value
+            self.misses += 1
+
+        value = loader()
+        if cacheable is None or cacheable(value):
+            self.set(key, value, ttl, max_stale)
+        return value
+
+    def set(self, key, value, ttl, max_stale=0, fetched_at=None):
+        """値を保存し、上限を超えたら最も古く使われたものを削除"""
+        with self._lock:
+            self._data[key] = (value, fetched_at or time.time(), ttl, max_stale)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def _refresh_in_background(self, key, loader, ttl, max_stale, cacheable):
+        """同じキーの更新が走っていなければ再取得スレッドを起動"""
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+
+        def run():
+            try:
+                value = loader()
+                if cacheable is None or cacheable(value):
+                    self.set(key, value, ttl, max_stale)
+                else:
+                    self.refresh_errors += 1
+            except Exception as e:
+                logger.warning("キャッシュ更新エラー", extra={"key": key, "error": str(e)})
+                self.refresh_errors += 1
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def age(self, key):
+        """保存からの経過秒数を返す（なければNone）"""
+        with self._lock:
+            entry = self._data.get(key)
+            return time.time() - entry[1] if entry is not None else None
+
+    def peek(self, key):
+        """期限に関係なく保存済みの値を返す（統計には数えない）"""
+        with self._lock:
+            entry = self._data.get(key)
+            return entry[0] if entry is not None else None
+
+    def invalidate(self, key=None):
+        """指定キー（省略時は全件）を削除"""
+        with self._lock:
+            if key is None:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+
+    def stats(self):
+        """ヒット/ミスなどの統計を返す"""
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "refresh_errors": self.refresh_errors,
+                "hit_ratio": (self.hits + self.stale_hits) / lookups if lookups else 0.0,
+            }
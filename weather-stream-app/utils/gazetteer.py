@@ -0,0 +1,151 @@
+import difflib
+import heapq
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+from array import array
+from bisect import bisect_left, bisect_right
+
+from utils.geocode import Place
+from utils.telemetry import span
+
+logger = logging.getLogger("weather.gazetteer")
+
+DEFAULT_GAZETTEER_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "assets", "gazetteer", "cities.tsv"
+)
+
+_PUNCTUATION = re.compile(r"[.'’`]")
+
+
+def normalize_name(name):
+    """索引用に地名を正規化（大文字小文字・アクセント記号・句読点・ハイフンを無視）
+
+    "São Paulo" -> "sao paulo"、"Xi'an" -> "xian"、"Rostov-on-Don" -> "rostov on don"。
+    濁点などアクセント記号以外の結合文字は残す（"ば" と "は" は区別する）。
+    """
+    decomposed = unicodedata.normalize("NFKD", str(name))
+    stripped = "".join(char for char in decomposed if not "\u0300" <= char <= "\u036f")
+    text = _PUNCTUATION.sub("", unicodedata.normalize("NFKC", stripped).casefold()).replace("-", " ")
+    return " ".join(text.split())
+
+
+def split_country(text):
+    """"Paris, FR" -> ("paris", "FR")。国コード（2文字）がなければ ("paris", None)"""
+    name, _, country = str(text).rpartition(",")
+    country = country.strip()
+    if name and len(country) == 2 and country.isalpha():
+        return normalize_name(name), country.upper()
+    return normalize_name(text), None
+
+
+class Gazetteer:
+    """同梱の都市一覧から作る前方一致の索引（最初に使われるまで読み込まない）
+
+    都市の列（名前・国コード・緯度・経度・人口）は配列に、名前と別名を正規化したキーは
+    ソート済みのリストに持ち、前方一致は bisect で範囲を求めるだけにする。
+    """
+
+    def __init__(self, path=DEFAULT_GAZETTEER_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._loaded = False
+        self.load_seconds = None
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if not self._loaded:
+                self._load()
+                self._loaded = True
+
+    def _load(self):
+        started = time.perf_counter()
+        names, countries = [], []
+        latitudes, longitudes, populations = array("d"), array("d"), array("q")
+        entries = []  # (キー, 都市の行番号)
+        try:
+            with span("gazetteer.load"), open(self.path, encoding="utf-8") as file:
+                for line in file:
+                    if not line.strip() or line.startswith("#"):
+                        continue
+                    fields = line.rstrip("\n").split("\t")
+                    try:
+                        name, country, latitude, longitude, population = fields[:5]
+                        latitudes.append(float(latitude))
+                        longitudes.append(float(longitude))
+                        populations.append(int(population or 0))
+                    except ValueError:
+                        logger.warning("地名一覧の不正な行を無視します", extra={"line": line.strip()})
+                        continue
+                    row = len(names)
+                    names.append(name)
+                    countries.append(country.upper())
+                    aliases = fields[5].split("|") if len(fields) > 5 else []
+                    for key in {normalize_name(alias) for alias in [name, *aliases]}:
+                        if key:
+                            entries.append((key, row))
+        except OSError as e:
+            logger.warning("地名一覧を読み込めません", extra={"path": self.path, "error": str(e)})
+        entries.sort()
+        self._keys = [key for key, _ in entries]
+        self._rows = array("I", (row for _, row in entries))
+        self._names, self._countries = names, countries
+        self._latitudes, self._longitudes, self._populations = latitudes, longitudes, populations
+        self.load_seconds = time.perf_counter() - started
+
+    def _place(self, row):
+        return Place(self._names[row], self._countries[row], self._latitudes[row], self._longitudes[row])
+
+    def _matching_rows(self, key, exact=False):
+        """キーが key と一致（exact=False なら key で始まる）する都市の行番号"""
+        start = bisect_left(self._keys, key)
+        end = bisect_right(self._keys, key) if exact else bisect_left(self._keys, key + "\U0010ffff")
+        return {self._rows[index] for index in range(start, end)}
+
+    def lookup(self, text):
+        """入力に完全に一致する都市を Place で返す（同名なら人口の多い方、なければ None）
+
+        "Portland, US" のように国コードを付けると、その国の都市に絞り込む。
+        """
+        self._ensure_loaded()
+        key, country = split_country(text)
+        if not key:
+            return None
+        rows = [row for row in self._matching_rows(key, exact=True) if country is None or self._countries[row] == country]
+        if not rows:
+            return None
+        return self._place(max(rows, key=self._populations.__getitem__))
+
+    def suggest(self, prefix, limit=8):
+        """入力で始まる都市を人口の多い順に "Tokyo, JP" の形で返す（候補表示用）
+
+        前方一致する都市がなければ、綴りの近い都市（"Tokio" -> Tokyo）を返す。
+        """
+        self._ensure_loaded()
+        key, country = split_country(prefix)
+        if not key:
+            return []
+        rows = self._matching_rows(key)
+        if not rows:
+            close = difflib.get_close_matches(key, self._keys, n=limit, cutoff=0.75)
+            rows = {row for match in close for row in self._matching_rows(match, exact=True)}
+        if country is not None:
+            rows = {row for row in rows if self._countries[row] == country}
+        best = heapq.nlargest(limit, rows, key=self._populations.__getitem__)
+        return [f"{self._names[row]}, {self._countries[row]}" for row in best]
+
+    def stats(self):
+        """読み込み済みか・都市数・キー数・読み込み時間を返す"""
+        if not self._loaded:
+            return {"loaded": False, "cities": 0, "keys": 0, "load_ms": None}
+        return {
+            "loaded": True,
+            "cities": len(self._names),
+            "keys": len(self._keys),
+            "load_ms": round(self.load_seconds * 1000, 2),
+        }
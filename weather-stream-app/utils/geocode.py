@@ -0,0 +1,249 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, replace
+
+from utils.cache import TTLCache, normalize_city
+from utils.providers import OPEN_METEO_GEOCODING_URL, instrumented_get
+from utils.singleflight import SingleFlight
+from utils.store import DEFAULT_STORE_PATH
+
+logger = logging.getLogger("weather.geocode")
+
+# 天気を共有するセルの大きさ（geohash の桁数。5桁で約4.9km四方）
+GEOHASH_PRECISION = int(os.getenv("WEATHER_GEOHASH_PRECISION", "5"))
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+_BASE32_INDEX = {char: index for index, char in enumerate(_BASE32)}
+
+
+class GeocodingUnavailableError(Exception):
+    """地名検索サービスの障害で都市名を解決できない（都市が存在しないのとは別）"""
+
+
+def geohash_encode(latitude, longitude, precision=GEOHASH_PRECISION):
+    """緯度経度を geohash 文字列にする（経度・緯度のビットを交互に5ビットずつ）"""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        target, coordinate = (lon_range, longitude) if even else (lat_range, latitude)
+        middle = (target[0] + target[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            target[0] = middle
+        else:
+            target[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits = value = 0
+    return "".join(chars)
+
+
+def geohash_bounds(cell):
+    """geohash のセルの範囲 (南, 北, 西, 東) を返す"""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for char in cell:
+        value = _BASE32_INDEX[char]
+        for shift in range(4, -1, -1):
+            target = lon_range if even else lat_range
+            middle = (target[0] + target[1]) / 2
+            if value >> shift & 1:
+                target[0] = middle
+            else:
+                target[1] = middle
+            even = not even
+    return lat_range[0], lat_range[1], lon_range[0], lon_range[1]
+
+
+def geohash_center(cell):
+    """geohash のセルの中心 (緯度, 経度) を返す"""
+    south, north, west, east = geohash_bounds(cell)
+    return (south + north) / 2, (west + east) / 2
+
+
+@dataclass(slots=True, frozen=True)
+class Place:
+    """都市名を解決した場所"""
+
+    name: str
+    country_code: str
+    latitude: float
+    longitude: float
+
+    def cell(self, precision=GEOHASH_PRECISION):
+        return geohash_encode(self.latitude, self.longitude, precision)
+
+    def snapped(self, precision=GEOHASH_PRECISION):
+        """座標をセルの中心に寄せた Place（同じセルの利用者が同じ地点の天気を共有する）"""
+        latitude, longitude = geohash_center(self.cell(precision))
+        return replace(self, latitude=round(latitude, 4), longitude=round(longitude, 4))
+
+
+def place_from_ipinfo(payload, name=None):
+    """ipinfo の応答の loc（"35.6895,139.6917"）を Place にする（なければ None）"""
+    try:
+        latitude, longitude = (float(value) for value in str(payload.get("loc") or "").split(","))
+    except ValueError:
+        return None
+    return Place(
+        name=name or payload.get("city") or payload.get("region") or "",
+        country_code=payload.get("country") or "",
+        latitude=latitude,
+        longitude=longitude,
+    )
+
+
+def geocode_open_meteo(session, city, url=OPEN_METEO_GEOCODING_URL):
+    """Open-Meteo のジオコーディングAPIで都市名を Place にする（見つからなければ None）"""
+    # "Paris, FR" のように国コードが付いていれば、その国の候補を選ぶ
+    name, _, country = (part.strip() for part in str(city).partition(","))
+    response = instrumented_get(
+        session, "open-meteo-geocoding", url,
+        params={"name": name, "count": 10, "language": "en", "format": "json"},
+    )
+    response.raise_for_status()
+    results = response.json().get("results") or []
+    if country:
+        results = [item for item in results if (item.get("country_code") or "").upper() == country.upper()] or results
+    if not results:
+        return None
+    item = results[0]
+    return Place(
+        name=item.get("name") or name,
+        country_code=item.get("country_code") or "",
+        latitude=float(item["latitude"]),
+        longitude=float(item["longitude"]),
+    )
+
+
+class GeocodingTable:
+    """都市名 -> 座標 のローカルの表（メモリ + SQLite）
+
+    "tokyo" / "Tokyo " / "Tokyo, JP" のような入力は、正規化した文字列ごとに一度だけ
+    lookup(city)（外部のジオコーディング）で解決し、以降はメモリかSQLiteから返す。
+    見つからなかった入力は not_found_ttl 秒だけ覚えて、同じ入力で何度も問い合わせない。
+    問い合わせ自体が失敗した入力（障害など）は error_ttl 秒は問い合わせず、その間は
+    「見つからない」と区別できるよう GeocodingUnavailableError を投げる。
+    """
+
+    def __init__(self, lookup, path=DEFAULT_STORE_PATH, not_found_ttl=10 * 60, error_ttl=45, maxsize=4096):
+        self.lookup = lookup
+        self.path = path
+        self.not_found_ttl = not_found_ttl
+        self.error_ttl = error_ttl
+        if path != ":memory:":
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS places (
+                query TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                country_code TEXT NOT NULL,
+                latitude REAL NOT NULL,
+                longitude REAL NOT NULL,
+                resolved_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+        self._memory = TTLCache(maxsize=maxsize)
+        self._not_found = TTLCache(maxsize=maxsize)
+        self._failed = TTLCache(maxsize=maxsize)
+        self._flight = SingleFlight()
+        self.stored = 0
+        self.remote = 0
+        self.not_found = 0
+        self.errors = 0
+        self.backed_off = 0
+
+    def resolve(self, city):
+        """都市名を Place にする（見つからなければ None、地名検索の障害中は GeocodingUnavailableError）"""
+        key = normalize_city(city)
+        if not key:
+            return None
+        return self._memory.get_or_load(
+            key, lambda: self._flight.do(key, lambda: self._load(key, city)), float("inf"), cacheable=bool
+        )
+
+    def _load(self, key, city):
+        place = self._read(key)
+        if place is not None:
+            self.stored += 1
+            return place
+        age = self._not_found.age(key)
+        if age is not None and age <= self.not_found_ttl:
+            return None
+        age = self._failed.age(key)
+        if age is not None and age <= self.error_ttl:
+            # 直前に失敗したばかり: 障害中に再実行のたびに待たされないよう、しばらく問い合わせない
+            self.backed_off += 1
+            raise GeocodingUnavailableError("地名検索サービスに接続できません")
+        try:
+            self.remote += 1
+            place = self.lookup(city)
+        except Exception as e:
+            # 一時的なエラーは短いあいだだけ覚える（error_ttl 秒後にまた問い合わせる）
+            logger.warning("ジオコーディングエラー", extra={"city": city, "error": str(e)})
+            self.errors += 1
+            self._failed.set(key, True, self.error_ttl)
+            raise GeocodingUnavailableError("地名検索サービスに接続できません") from e
+        if place is None:
+            self.not_found += 1
+            self._not_found.set(key, True, self.not_found_ttl)
+            return None
+        self._write(key, place)
+        return place
+
+    def _read(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT name, country_code, latitude, longitude FROM places WHERE query = ?", (key,)
+            ).fetchone()
+        return Place(*row) if row else None
+
+    def _write(self, key, place):
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO places VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, place.name, place.country_code, place.latitude, place.longitude, time.time()),
+                )
+                self._conn.commit()
+        except sqlite3.Error as e:
+            logger.warning("地名表の保存エラー", extra={"query": key, "error": str(e)})
+
+    def stats(self):
+        """メモリ・SQLite・外部問い合わせの件数を返す"""
+        memory = self._memory.stats()
+        return {
+            "size": memory["size"],
+            "memory_hits": memory["hits"],
+            "stored": self.stored,
+            "remote": self.remote,
+            "not_found": self.not_found,
+            "errors": self.errors,
+            "backed_off": self.backed_off,
+        }
+
+
+def open_geocoding_table(lookup, path=None):
+    """WEATHER_STORE_PATH と同じSQLiteに地名表を開く（開けなければメモリ上だけで持つ）"""
+    path = path or os.getenv("WEATHER_STORE_PATH") or DEFAULT_STORE_PATH
+    try:
+        return GeocodingTable(lookup, path)
+    except (sqlite3.Error, OSError) as e:
+        logger.warning("地名表を開けません", extra={"path": path, "error": str(e)})
+        return GeocodingTable(lookup, ":memory:")
@@ -0,0 +1,62 @@
+import bisect
+import csv
+import ipaddress
+import os
+import threading
+
+
+class IPRangeDatabase:
+    """ローカルのIP範囲データベース（CSV）から地域を検索
+
+    CSVは ``start_ip,end_ip,region`` の3列（ヘッダー行は任意）。
+    ファイルは最初の検索時に一度だけ読み込む。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._starts = []
+        self._ranges = []  # (start, end, region) を start 順に並べたもの
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _load(self):
+        """CSVを読み込んで範囲を開始アドレス順に並べる"""
+        ranges = []
+        with open(self.path, newline="", encoding="utf-8") as file:
+            for row in csv.reader(file):
+                if len(row) < 3 or row[0].startswith("#"):
+                    continue
+                try:
+                    start = int(ipaddress.ip_address(row[0].strip()))
+                    end = int(ipaddress.ip_address(row[1].strip()))
+                except ValueError:
+                    continue  # ヘッダー行や不正な行は読み飛ばす
+                ranges.append((start, end, row[2].strip()))
+        ranges.sort()
+        self._ranges = ranges
+        self._starts = [start for start, _, _ in ranges]
+        self._loaded = True
+
+    def lookup(self, ip):
+        """IPアドレスを含む範囲の地域名を返す（見つからなければNone）"""
+        with self._lock:
+            if not self._loaded:
+                self._load()
+        try:
+            value = int(ipaddress.ip_address(ip))
+        except ValueError:
+            return None
+        index = bisect.bisect_right(self._starts, value) - 1
+        if index >= 0:
+            start, end, region = self._ranges[index]
+            if start <= value <= end and region:
+                return region
+        return None
+
+
+def load_ip_database(path=None):
+    """環境変数 IP_REGION_DB で指定されたデータベースを返す（未設定ならNone）"""
+    path = path or os.getenv("IP_REGION_DB")
+    if path and os.path.exists(path):
+        return IPRangeDatabase(path)
+    return None
@@ -1,72 +1,455 @@
 
-import requests
 from dotenv import load_dotenv
 import os
 import streamlit as st
 import time
+from html import escape
 from streamlit_elements import elements, html
-import base64
+import numpy as np
+import pandas as pd
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait, TimeoutError as FuturesTimeoutError
+from utils.cache import TTLCache, normalize_city
+from utils.http_client import http_session
+from utils.geoip import load_ip_database
+from utils.singleflight import SingleFlight
+from utils.store import open_forecast_store, open_usage_ledger
+from utils.quota import QuotaManager
+from utils.models import WeatherResult, parse_response, same_data
+from utils.refresher import AutoRefresher
+from utils.icons import IconResolver
+from utils.assets import AssetRegistry
+from utils.telemetry import bind_context, current_recorder, get_logger, metrics, span, start_metrics_server
+from utils.providers import HedgedFetcher, create_providers, hedge_after_from_env, instrumented_get
+from utils.geocode import GeocodingUnavailableError, geocode_open_meteo, open_geocoding_table, place_from_ipinfo
+from utils.gazetteer import Gazetteer
+from utils.history import open_history_store
 
 # 環境変数を読み込む
 load_dotenv()
 api_key = os.getenv("WEATHER_API_KEY")
 
+# 構造化ログ（WEATHER_LOG_FORMAT / WEATHER_LOG_LEVEL で形式とレベルを変えられる）
+logger = get_logger("helper")
+
+# 外部APIのURL（ベンチマークではローカルの代替サーバーに向ける）
+WEATHERBIT_BASE_URL = os.getenv("WEATHERBIT_BASE_URL", "https://api.weatherbit.io/v2.0/")
+IPIFY_URL = os.getenv("IPIFY_URL", "https://api.ipify.org?format=json")
+IPINFO_URL = os.getenv("IPINFO_URL", "https://ipinfo.io/{ip}/json")
+
+# エンドポイントごとのキャッシュ期間（秒）: (新鮮とみなす期間, 期限切れデータを返す猶予)
+ENDPOINT_TTLS = {
+    "current": (10 * 60, 60 * 60),
+    "forecast/hourly": (30 * 60, 3 * 60 * 60),
+    "forecast/daily": (3 * 60 * 60, 24 * 60 * 60),
+}
+
+# 全セッションで共有する天気データキャッシュ
+weather_cache = TTLCache(maxsize=256)
+
+# WeatherBitのレート制限と1日の利用枠（使った回数はSQLiteに記録し、再起動や別プロセスとも共有する）
+weatherbit_quota = QuotaManager.from_env(ledger=open_usage_ledger())
+
+# 同じリクエストの同時実行を1回にまとめる
+upstream_flight = SingleFlight()
+
+# 取得結果を書き込むディスクストア（再起動後のキャッシュ復元用）
+forecast_store = open_forecast_store()
+STORE_MAX_AGE = max(ttl + max_stale for ttl, max_stale in ENDPOINT_TTLS.values())
+
+
+def warm_weather_cache():
+    """ディスクストアから最近のデータを読み込んでキャッシュを温める"""
+    if forecast_store is None:
+        return 0
+    warmed = 0
+    try:
+        forecast_store.prune(STORE_MAX_AGE)
+        for key, payload, fetched_at in forecast_store.load_recent(STORE_MAX_AGE):
+            ttl, max_stale = ENDPOINT_TTLS.get(key[0], (0, 0))
+            if time.time() - fetched_at <= ttl + max_stale:
+                result = parse_response(key[0], payload)
+                if result.ok:
+                    # 取得時刻を引き継ぐので、古いものは初回アクセス時に裏で再取得される
+                    weather_cache.set(key, result, ttl, max_stale, fetched_at=fetched_at)
+                    warmed += 1
+    except Exception as e:
+        logger.warning("キャッシュ復元エラー", extra={"error": str(e)})
+    return warmed
+
+
+warm_weather_cache()
+
+# 取得した天気を都市（セル）・日ごとに追記していく履歴（過去の観測のグラフ用）
+history_store = open_history_store()
+
+# 現在地検出の結果キャッシュ（公開IPと地域名）
+location_cache = TTLCache(maxsize=1024)
+PUBLIC_IP_TTL = 60 * 60
+REGION_TTL = 24 * 60 * 60
+
+# オフライン検索用のIP範囲データベース（IP_REGION_DB 未設定なら使わない）
+ip_database = load_ip_database()
+
+# ローカルのアイコンを一度だけdata URLにして保持する
+asset_registry = AssetRegistry()
+
+# WeatherBitのアイコンコードを同梱のアニメーションアイコンに対応付ける
+icon_resolver = IconResolver(asset_registry)
+
+# タイプライター表示用のCSS（文字ごとの遅延はspanのanimation-delayで指定）
+TYPEWRITER_CSS = (
+    "<style>"
+    ".typewriter span{opacity:0;animation:typewriter-reveal .01s linear forwards;}"
+    "@keyframes typewriter-reveal{to{opacity:1;}}"
+    "</style>"
+)
+
+# 同梱の都市一覧の前方一致索引（候補表示と入力チェック用。最初に使われるまで読み込まない）
+city_gazetteer = Gazetteer()
+
+# 都市名 -> 座標 のローカルの地名表（解決できた都市は geohash のセル単位で天気を共有する）
+geocoding_table = open_geocoding_table(lambda city: geocode_open_meteo(http_session, city))
+
+# 天気プロバイダー（WEATHER_PROVIDERS の順。第一候補が遅ければ次の候補にも同時に問い合わせる）
+weather_providers = HedgedFetcher(
+    create_providers(http_session, WEATHERBIT_BASE_URL, api_key, weatherbit_quota),
+    hedge_after=hedge_after_from_env(),
+)
+
+# 現在・時間ごと・日ごとの天気を並行取得するためのスレッドプール
+fetch_pool = ThreadPoolExecutor(max_workers=12, thread_name_prefix="weather-fetch")
+
 class HelperClass:
     def __init__(self):
         # WeatherBit APIキーとベースURLを初期化
         self.api_key = api_key
-        self.base_url = "https://api.weatherbit.io/v2.0/"
+        self.base_url = WEATHERBIT_BASE_URL
+        # 全セッション共有のKeep-Alive接続プール
+        self.session = http_session
+
+    # take_weather* と iter_weather_bundle の place は、呼び出し元が resolve_place() で解決済みの場所。
+    # 省略すると都市名から解決する（1回の再実行で同じ都市を何度も解決しないように渡す）
 
-    def take_weather_hourly(self, hours, city):
-        """指定都市の時間ごとの天気予報を取得"""
+    def take_weather_hourly(self, hours, city, place=None):
+        """指定都市の時間ごとの天気予報を取得（WeatherResult[HourlyForecast]）"""
         if not (1 <= hours <= 120):
             hours = 24  # デフォルト24時間
+        return self._cached_request("forecast/hourly", city, "時間ごとの天気取得", place, hours=hours)
 
+    def take_weather(self, city, place=None):
+        """指定都市の現在の天気を取得（WeatherResult[CurrentWeather]）"""
+        return self._cached_request("current", city, "現在の天気取得", place)
+
+    def take_weather_daily(self, city, place=None):
+        """指定都市の日ごとの天気予報を取得（WeatherResult[DailyForecast]）"""
+        return self._cached_request("forecast/daily", city, "日ごとの天気取得", place)
+
+    def _request(self, endpoint, city, place, **params):
+        """プロバイダー（WeatherBit、遅い・失敗したときは Open-Meteo など）から共通形式のJSONを取得"""
+        # 同じセルの利用者が同じ天気を共有するので、セルの中心の座標で取得する
+        return weather_providers.fetch(endpoint, city, place=place.snapped(), **params)
+
+    def resolve_place(self, city):
+        """都市名を座標に解決する（同梱の都市一覧、地名表の順。解決できなければ None）
+
+        地名検索サービスの障害で調べられないときは GeocodingUnavailableError（「見つからない」とは区別する）。
+        """
+        with span("geocode"):
+            return city_gazetteer.lookup(city) or geocoding_table.resolve(city)
+
+    def lookup_city(self, city):
+        """同梱の都市一覧に完全に一致する都市を返す（なければ None。外部には問い合わせない）"""
+        return city_gazetteer.lookup(city)
+
+    def suggest_cities(self, prefix, limit=8):
+        """入力で始まる都市を人口の多い順に "Tokyo, JP" の形で返す"""
+        return city_gazetteer.suggest(prefix, limit)
+
+    def location_key(self, city, place=None):
+        """天気を共有する単位: 座標に解決できれば geohash のセル、できなければ正規化した都市名"""
+        return self._location_key(city, place if place is not None else self.resolve_place(city))
+
+    @staticmethod
+    def _location_key(city, place):
+        return f"gh:{place.cell()}" if place is not None else normalize_city(city)
+
+    def _resolve(self, city, place):
+        """解決済みの place があればそれを、なければ都市名を解決する（地名検索の障害時は例外）"""
+        return place if place is not None else self.resolve_place(city)
+
+    def _get(self, service, url, endpoint="", **kwargs):
+        """外部APIにGETし、所要時間とステータスをメトリクスに記録する"""
+        return instrumented_get(self.session, service, url, endpoint=endpoint, **kwargs)
+
+    def _cache_policy(self, endpoint, city, place, params):
+        """キャッシュキーと (TTL, 猶予) を返す（place は解決済みの場所か None）"""
+        # 残りの利用枠が少ないほどキャッシュを長く使う
+        multiplier = weatherbit_quota.ttl_multiplier()
+        ttl, max_stale = (seconds * multiplier for seconds in ENDPOINT_TTLS[endpoint])
+        # "tokyo" / "Tokyo, JP" や近くの地点は同じキー（同じセル）になる
+        key = (endpoint, self._location_key(city, place), params.get("hours"))
+        return key, ttl, max_stale
+
+    def _loader(self, endpoint, city, place, label, key, params, persist=True):
+        """上流から取得・保存・解析する関数を作る（同じキーの同時呼び出しは1回にまとめる）
+
+        persist=False ならディスクストアと履歴に書かない（一括取得の結果で次回起動時のキャッシュを埋めない）。
+        """
+        def load():
+            if place is None:
+                # 場所に解決できない入力（入力ミスなど）は上流に送らず、利用枠も使わない
+                return WeatherResult.failure(f"エラー: 都市が見つかりません（{city}）")
+            try:
+                data = self._request(endpoint, city, place, **params)
+            except Exception as e:
+                # エラー時にログとエラー情報を返す
+                logger.warning(f"{label}エラー", extra={"endpoint": endpoint, "city": city, "error": str(e)})
+                return WeatherResult.failure(f"エラー: {e}")
+            if persist:
+                self._save_to_store(key, data)
+            # JSONはここで一度だけ解析し、キャッシュには解析済みの結果を置く
+            with span(f"parse.{endpoint}"):
+                result = parse_response(endpoint, data)
+            if persist and history_store is not None:
+                history_store.record(key[1], result)
+            return result
+
+        return lambda: upstream_flight.do(key, load)
+
+    def _cached_request(self, endpoint, city, label, place=None, **params):
+        """共有キャッシュ経由でWeatherBit APIを呼び出し、解析済みの結果を返す"""
         try:
-            url = f"{self.base_url}forecast/hourly?city={city}&key={self.api_key}&hours={hours}"
-            response = requests.get(url)
-            response.raise_for_status()
-            return response.json()
-        except Exception as e:
-            # エラー時にログとエラー情報を返す
-            print(f"時間ごとの天気取得エラー: {e}")
-            return {"error": f"エラー: {e}"}
+            place = self._resolve(city, place)
+        except GeocodingUnavailableError as e:
+            return WeatherResult.failure(f"エラー: {e}")
+        key, ttl, max_stale = self._cache_policy(endpoint, city, place, params)
+        recorder = current_recorder()
+        if recorder is not None:
+            recorder.record_cache("weather", endpoint, city, self._cache_state(key, ttl, max_stale))
+        # エラー結果はキャッシュしない
+        result = weather_cache.get_or_load(
+            key, self._loader(endpoint, city, place, label, key, params), ttl, max_stale, cacheable=lambda result: result.ok
+        )
+        if not result.ok:
+            # 利用枠切れなどで取得できないときは、古くても前回のデータを返す
+            last_known = weather_cache.peek(key)
+            if last_known is not None:
+                return last_known
+        return result
+
+    def _cache_state(self, key, ttl, max_stale):
+        """キャッシュから返せるかを "hit" / "stale" / "miss" で返す（プロファイル表示用）"""
+        age = weather_cache.age(key)
+        if age is None or age > ttl + max_stale:
+            return "miss"
+        return "hit" if age <= ttl else "stale"
 
-    def take_weather(self, city):
-        """指定都市の現在の天気を取得"""
+    def _refresh(self, endpoint, city, place, label, **params):
+        """期限切れなら再取得してキャッシュを更新し、データが変わったらTrueを返す"""
+        key, ttl, max_stale = self._cache_policy(endpoint, city, place, params)
+        age = weather_cache.age(key)
+        if age is not None and age <= ttl:
+            return False
+        previous = weather_cache.peek(key)
+        result = self._loader(endpoint, city, place, label, key, params)()
+        if not result.ok:
+            return False
+        weather_cache.set(key, result, ttl, max_stale)
+        return previous is None or not same_data(previous, result)
+
+    def refresh_city(self, city, hours=24, include_daily=True, place=None):
+        """都市の天気のうち期限切れのものを再取得し、どれかが変わったらTrueを返す"""
         try:
-            url = f"{self.base_url}current?city={city}&key={self.api_key}"
-            response = requests.get(url)
-            response.raise_for_status()
-            return response.json()
-        except Exception as e:
-            # エラー時にログとエラー情報を返す
-            print(f"現在の天気取得エラー: {e}")
-            return {"error": f"エラー: {e}"}
+            place = self._resolve(city, place)
+        except GeocodingUnavailableError:
+            return False  # 地名検索が戻るまで今のキャッシュを使い続ける
+        changed = self._refresh("current", city, place, "現在の天気取得")
+        changed = self._refresh("forecast/hourly", city, place, "時間ごとの天気取得", hours=hours) or changed
+        if include_daily:
+            changed = self._refresh("forecast/daily", city, place, "日ごとの天気取得") or changed
+        return changed
+
+    def watch_city(self, city, hours=24, include_daily=True, place=None):
+        """自動更新の対象として都市を登録し、現在のデータ版数を返す"""
+        return auto_refresher.watch(city, hours, include_daily, place)
 
-    def take_weather_daily(self, city):
-        """指定都市の日ごとの天気予報を取得"""
+    def refresher_stats(self):
+        """自動更新の対象都市数と更新回数を返す"""
+        return auto_refresher.stats()
+
+    def _save_to_store(self, key, data):
+        """取得結果をディスクストアに書き込む（失敗しても処理は続ける）"""
+        if forecast_store is None:
+            return
         try:
-            url = f"{self.base_url}forecast/daily?city={city}&key={self.api_key}"
-            response = requests.get(url)
-            response.raise_for_status()
-            return response.json()
+            forecast_store.save(key, data)
         except Exception as e:
-            # エラー時にログとエラー情報を返す
-            print(f"日ごとの天気取得エラー: {e}")
-            return {"error": f"エラー: {e}"}
+            logger.warning("天気ストア保存エラー", extra={"key": key, "error": str(e)})
+
+    def iter_weather_bundle(self, city, hours=24, include_daily=True, timeout=10.0, place=None):
+        """現在・時間ごと・日ごとの天気を並行取得し、届いた順に (名前, データ) を返す
+
+        timeout 秒以内に返らなかったものはエラー情報として返す。
+        """
+        place = self._resolve_quietly(city, place)
+        futures = {
+            fetch_pool.submit(bind_context(self.take_weather), city, place): "current",
+            fetch_pool.submit(bind_context(self.take_weather_hourly), hours, city, place): "hourly",
+        }
+        if include_daily:
+            futures[fetch_pool.submit(bind_context(self.take_weather_daily), city, place)] = "daily"
+
+        pending = set(futures)
+        try:
+            for future in as_completed(futures, timeout=timeout):
+                pending.discard(future)
+                yield futures[future], future.result()
+        except FuturesTimeoutError:
+            for future in pending:
+                if future.done():
+                    yield futures[future], future.result()
+                else:
+                    # 期限切れ: 取得自体は裏で続き、結果はキャッシュに入る
+                    logger.warning("天気取得がタイムアウトしました", extra={"city": city, "kind": futures[future], "timeout": timeout})
+                    yield futures[future], WeatherResult.failure(f"エラー: {timeout}秒以内に応答がありません")
+
+    def fetch_weather_bundle(self, city, hours=24, include_daily=True, timeout=10.0, place=None):
+        """現在・時間ごと・日ごとの天気を並行取得して辞書で返す"""
+        return dict(self.iter_weather_bundle(city, hours, include_daily, timeout, place))
+
+    def _resolve_quietly(self, city, place):
+        """まとめて取得する前に一度だけ解決する（地名検索の障害時は None にして、各取得でエラーを返させる）"""
+        try:
+            return self._resolve(city, place)
+        except GeocodingUnavailableError:
+            return None
+
+    def _uncached_request(self, endpoint, city, label, place=None, **params):
+        """共有キャッシュにもディスクストアにも入れずに取得する（一括エクスポート用。新しいキャッシュがあればそれを使う）"""
+        try:
+            place = self._resolve(city, place)
+        except GeocodingUnavailableError as e:
+            return WeatherResult.failure(f"エラー: {e}")
+        key, ttl, _ = self._cache_policy(endpoint, city, place, params)
+        age = weather_cache.age(key)
+        if age is not None and age <= ttl:
+            return weather_cache.peek(key)
+        return self._loader(endpoint, city, place, label, key, params, persist=False)()
+
+    def iter_cities(self, cities, hours=24, include_daily=True, concurrency=4, use_cache=True, places=None):
+        """複数都市の天気を並行取得し、終わった都市から (都市名, 結果の辞書) を返す
+
+        同時に処理する都市数は concurrency まで。WeatherBitのレート制限は
+        QuotaManager がかけるので、ここでは並列数だけを制御する。
+        投入済みで未回収の都市は concurrency * 2 までにして、都市数が多くてもメモリを増やさない。
+        use_cache=False なら結果を共有キャッシュ・ディスクストア・履歴に入れない（一括取得で画面の利用者のキャッシュを追い出さない）。
+        places（都市名 -> 解決済みの Place）にない都市は、都市ごとに一度だけ解決する。
+        """
+        places = places or {}
+        request = self._cached_request if use_cache else self._uncached_request
+        if not (1 <= hours <= 120):
+            hours = 24  # take_weather_hourly と同じデフォルト
+
+        def fetch(city):
+            place = self._resolve_quietly(city, places.get(city))
+            results = {
+                "current": request("current", city, "現在の天気取得", place),
+                "hourly": request("forecast/hourly", city, "時間ごとの天気取得", place, hours=hours),
+            }
+            if include_daily:
+                results["daily"] = request("forecast/daily", city, "日ごとの天気取得", place)
+            return results
+
+        window = max(concurrency, 1) * 2
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="weather-batch") as pool:
+            futures = {}
+            seen = set()
+            for city in cities:
+                if city in seen:
+                    continue
+                seen.add(city)
+                if len(futures) >= window:
+                    done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield futures.pop(future), future.result()
+                futures[pool.submit(fetch, city)] = city
+            for future in as_completed(list(futures)):
+                yield futures.pop(future), future.result()
+
+    def fetch_cities(self, cities, hours=24, include_daily=True, concurrency=4, places=None):
+        """複数都市の天気を並行取得して {都市名: 結果の辞書} で返す"""
+        return dict(self.iter_cities(cities, hours, include_daily, concurrency, places=places))
+
+    def cache_stats(self):
+        """天気キャッシュのヒット/ミス統計を返す"""
+        return weather_cache.stats()
+
+    def quota_stats(self):
+        """WeatherBitの残り利用枠とスロットリングの統計を返す"""
+        return weatherbit_quota.stats()
+
+    def provider_stats(self):
+        """プロバイダーごとの応答時間（p50/p95）と成功・失敗・採用・ヘッジの回数を返す"""
+        return weather_providers.stats()
+
+    def geocoding_stats(self):
+        """地名表のメモリ・SQLite・外部問い合わせの件数を返す"""
+        return geocoding_table.stats()
+
+    def weather_history(self, city, days=7, resolution=None, place=None):
+        """都市の直近 days 日分の観測履歴を DataFrame で返す（期間が長いほど粗い集計を読む）"""
+        if history_store is None:
+            return pd.DataFrame()
+        return history_store.read(self.location_key(city, place), days, resolution)
+
+    def history_stats(self):
+        """履歴に追記した行数・重複・書き込みエラーの数を返す"""
+        return history_store.stats() if history_store is not None else {}
+
+    def gazetteer_stats(self):
+        """同梱の都市一覧の読み込み状況（都市数・キー数・読み込み時間）を返す"""
+        return city_gazetteer.stats()
+
+    def coalescing_stats(self):
+        """まとめられた（節約できた）上流リクエスト数を返す"""
+        return upstream_flight.stats()
 
     def take_user_location(self):
-        """IPアドレスからユーザーの地域を検出"""
+        """IPアドレスからユーザーの地域を検出し (地域名, Place) を返す（検出できなければ None）
+
+        結果はIPごとに REGION_TTL 秒キャッシュする。Place は ipinfo の座標で、ローカルのIPデータベースで
+        検出したときは None（地域名で解決する）。地域名は都市一覧にないことが多いので、Place は
+        検出したセッションの中だけで使い、都市名として全員に共有しない。
+        """
         try:
-            ip = requests.get("https://api.ipify.org?format=json").json()["ip"]
-            result = requests.get(f"https://ipinfo.io/{ip}/json")
-            return result.json().get("region", None)
+            with span("location"):
+                ip = location_cache.get_or_load("ip", self._lookup_public_ip, PUBLIC_IP_TTL, cacheable=bool)
+                if not ip:
+                    return None
+                return location_cache.get_or_load(
+                    ("region", ip), lambda: self._lookup_region(ip), REGION_TTL, cacheable=lambda found: bool(found[0])
+                )
         except Exception as e:
             # エラー時にログとNoneを返す
-            print(f"現在地検出エラー: {e}")
+            logger.warning("現在地検出エラー", extra={"error": str(e)})
             return None
 
+    def _lookup_public_ip(self):
+        """公開IPアドレスを取得"""
+        response = self._get("ipify", IPIFY_URL)
+        return response.json()["ip"]
+
+    def _lookup_region(self, ip):
+        """ローカルのIPデータベース、なければipinfoで (地域名, Place または None) を取得"""
+        if ip_database is not None:
+            with span("location.ip_database"):
+                region = ip_database.lookup(ip)
+            if region:
+                return region, None
+        result = self._get("ipinfo", IPINFO_URL.format(ip=ip)).json()
+        region = result.get("region", None)
+        return region, place_from_ipinfo(result, region) if region else None
+
     def convert_temperature(self, temp, to_unit="Celsius"):
         """温度を摂氏/華氏に変換"""
         try:
@@ -76,26 +459,77 @@ class HelperClass:
             return round(temp, 1)  # 摂氏を返す
         except (TypeError, ValueError) as e:
             # エラー時にログと元の値を返す
-            print(f"温度変換エラー: {e}")
+            logger.warning("温度変換エラー", extra={"value": temp, "error": str(e)})
             return temp
 
+    def convert_temperature_series(self, temps, to_unit="Celsius"):
+        """温度の配列をまとめて摂氏/華氏に変換（欠損はNaNのまま）"""
+        temps = np.asarray(temps, dtype=np.float64)
+        if to_unit == "Fahrenheit":
+            temps = temps * 9 / 5 + 32  # 摂氏→華氏
+        return np.round(temps, 1)
+
+    def align_hourly_temperatures(self, forecasts, hours, to_unit="Celsius", start=None):
+        """都市ごとの時間ごとの予報を UTC の時刻でそろえた表にする（列は都市、行は start から hours 時間）
+
+        都市ごとに取得時刻が違うことがあるので、行番号ではなく UTC の時刻で合わせる。
+        UTC の時刻がない行と同じ時刻の2行目以降は使わない。どの都市も使えなければ空の DataFrame。
+        """
+        series = {}
+        for city, forecast in forecasts.items():
+            temps = pd.Series(self.convert_temperature_series(forecast.temp, to_unit), index=pd.DatetimeIndex(forecast.timestamps_utc))
+            temps = temps[temps.index.notna()]
+            if not temps.empty:
+                series[city] = temps[~temps.index.duplicated()]
+        if not series:
+            return pd.DataFrame()
+        start = start if start is not None else pd.Timestamp.now(tz="UTC").tz_localize(None).ceil("h")
+        axis = pd.date_range(start, periods=hours, freq="h", name="Time (UTC)")
+        return pd.concat(series, axis=1, sort=True).reindex(axis)
+
+    def format_time_labels(self, timestamps, fmt, fallback_prefix="H"):
+        """日時の配列をまとめて文字列ラベルに変換（NaTは連番で補う）"""
+        labels = pd.DatetimeIndex(timestamps).strftime(fmt).to_numpy(dtype=object)
+        missing = pd.isna(labels)
+        if missing.any():
+            labels[missing] = [f"{fallback_prefix}{i + 1}" for i in np.flatnonzero(missing)]
+        return labels.tolist()
+
+    def series_points(self, labels, values):
+        """ラベルと値の配列をチャート用の点リストにまとめる（NaNはNone）"""
+        values = np.where(np.isnan(values), None, values).tolist()
+        return [{"x": x, "y": y} for x, y in zip(labels, values)]
+
+    def icon_url(self, code):
+        """WeatherBitのアイコンコードを、ローカルから配信するアイコンのURLに変換"""
+        try:
+            return icon_resolver.url_for(
+                code,
+                base_url_path=st.get_option("server.baseUrlPath") or "",
+                static_serving=st.get_option("server.enableStaticServing"),
+            )
+        except OSError as e:
+            logger.warning("アイコン取得エラー", extra={"code": code, "error": str(e)})
+            return None
+
     def stream_header_text(self, text: str, speed: float = 0.05):
-        """テキストをヘッダーとして1文字ずつ表示"""
-        title_placeholder = st.empty()
-        current_title = ""
-        for char in text:
-            current_title += char
-            title_placeholder.header(current_title)
-            time.sleep(speed)
+        """テキストをヘッダーとして1文字ずつ表示（アニメーションはブラウザ側で実行）"""
+        st.markdown(self._typewriter_html(text, "h2", speed), unsafe_allow_html=True)
 
     def stream_sub_header_text(self, text: str, speed: float = 0.05):
-        """テキストをサブヘッダーとして1文字ずつ表示"""
-        title_placeholder = st.empty()
-        current_title = ""
-        for char in text:
-            current_title += char
-            title_placeholder.subheader(current_title)
-            time.sleep(speed)
+        """テキストをサブヘッダーとして1文字ずつ表示（アニメーションはブラウザ側で実行）"""
+        st.markdown(self._typewriter_html(text, "h3", speed), unsafe_allow_html=True)
+
+    def _typewriter_html(self, text, tag, speed):
+        """1文字ずつ遅れて現れるCSSアニメーション付きの見出しHTMLを作る
+
+        全文を1回で送るので、スクリプトは待たずに次の要素の描画へ進む。
+        """
+        chars = "".join(
+            f'<span style="animation-delay:{index * speed:.2f}s">{escape(char)}</span>'
+            for index, char in enumerate(text)
+        )
+        return f"{TYPEWRITER_CSS}<{tag} class=\"typewriter\" aria-label=\"{escape(text)}\">{chars}</{tag}>"
 
     def display_animated_icon_on_elements(self, path_or_url):
         """GIFアイコンをURLまたはローカルファイルから表示"""
@@ -104,9 +538,62 @@ class HelperClass:
                 html.img(src=path_or_url, style={"width": "100%", "height": "auto"})
             else:
                 try:
-                    with open(path_or_url, "rb") as file:
-                        contents = file.read()
-                        data_url = base64.b64encode(contents).decode("utf-8")
-                        html.img(src=f"data:image/gif;base64,{data_url}", style={"width": "100%", "height": "auto"})
+                    # 読み込みとbase64変換は初回だけ（以降はメモリから）
+                    html.img(src=asset_registry.data_url(path_or_url), style={"width": "100%", "height": "auto"})
                 except FileNotFoundError:
                     html.div("GIFファイルが見つかりません。")
+
+
+# アクティブなセッションが見ている都市だけを定期的に再取得する
+def _refresh_key(city, place=None):
+    """自動更新で同じ場所をまとめるキー（地名検索の障害中は都市名のまま）"""
+    try:
+        return HelperClass().location_key(city, place)
+    except GeocodingUnavailableError:
+        return normalize_city(city)
+
+
+auto_refresher = AutoRefresher(
+    lambda city, hours, include_daily, place: HelperClass().refresh_city(city, hours, include_daily, place),
+    key_func=_refresh_key,
+)
+
+
+def _cache_samples(stat):
+    """キャッシュごとの統計値を [(ラベル, 値), ...] で返す関数を作る"""
+    caches = (("weather", weather_cache), ("location", location_cache))
+    return lambda: [({"cache": name}, cache.stats()[stat]) for name, cache in caches]
+
+
+# 既存の統計を /metrics で公開する（WEATHER_METRICS_PORT を設定したときだけサーバーを起動）
+metrics.counter_callback("weather_cache_lookups_total", "Cache lookups by result", lambda: [
+    ({"cache": name, "result": result}, cache.stats()[field])
+    for name, cache in (("weather", weather_cache), ("location", location_cache))
+    for result, field in (("hit", "hits"), ("stale", "stale_hits"), ("miss", "misses"))
+])
+metrics.gauge_callback("weather_cache_hit_ratio", "Share of lookups served from cache", _cache_samples("hit_ratio"))
+metrics.gauge_callback("weather_cache_entries", "Entries held in each cache", _cache_samples("size"))
+metrics.counter_callback("weather_cache_refresh_errors_total", "Failed background refreshes", _cache_samples("refresh_errors"))
+metrics.gauge_callback("weather_quota_remaining", "WeatherBit calls left in today's budget", lambda: [
+    ({}, weatherbit_quota.stats()["remaining_today"])
+])
+metrics.counter_callback("weather_quota_events_total", "Throttled, rejected and upstream rate-limited calls", lambda: [
+    ({"event": event}, weatherbit_quota.stats()[event]) for event in ("throttled", "rejected", "upstream_rate_limited")
+])
+metrics.counter_callback("weather_coalesced_calls_total", "Upstream loads executed vs. shared with an in-flight call", lambda: [
+    ({"result": result}, upstream_flight.stats()[result]) for result in ("executed", "shared")
+])
+metrics.gauge_callback("weather_provider_latency_p95_seconds", "Recent p95 latency of each weather provider", lambda: [
+    ({"provider": name}, stats["p95_ms"] / 1000) for name, stats in weather_providers.stats().items() if stats["p95_ms"] is not None
+])
+metrics.counter_callback("weather_geocode_lookups_total", "City name resolutions by source", lambda: [
+    ({"source": source}, geocoding_table.stats()[field])
+    for source, field in (("memory", "memory_hits"), ("store", "stored"), ("remote", "remote"), ("not_found", "not_found"), ("error", "errors"), ("backed_off", "backed_off"))
+])
+metrics.gauge_callback("weather_watched_cities", "Cities kept fresh by the auto-refresher", lambda: [
+    ({}, auto_refresher.stats()["watched_cities"])
+])
+metrics.counter_callback("weather_refresher_events_total", "Auto-refresher refreshes, changes and errors", lambda: [
+    ({"event": event}, auto_refresher.stats()[event]) for event in ("refreshes", "changes", "errors")
+])
+start_metrics_server()
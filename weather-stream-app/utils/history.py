@@ -0,0 +1,395 @@
+import atexit
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+
+from utils.models import CurrentWeather, DailyForecast, HourlyForecast
+from utils.store import DEFAULT_STORE_PATH
+from utils.telemetry import span
+
+logger = logging.getLogger("weather.history")
+
+# 集計する観測値（件数・合計・最小・最大を持ち、平均は読み出し時に計算する）
+ROLLUP_METRICS = ("temp", "app_temp", "rh", "pres", "wind_spd")
+OBSERVATION_METRICS = ROLLUP_METRICS + ("clouds", "uv", "vis")
+
+# 期間に応じた読み出しの細かさ: この日数までなら生データ、次は1時間ごと、それより長ければ1日ごと
+RAW_MAX_DAYS = 2
+HOURLY_MAX_DAYS = 14
+
+
+def choose_resolution(days):
+    """表示する日数から "raw" / "hourly" / "daily" を選ぶ（数百行で済むように）"""
+    if days <= RAW_MAX_DAYS:
+        return "raw"
+    return "hourly" if days <= HOURLY_MAX_DAYS else "daily"
+
+
+# 開いている集計（いまの1時間・1日）をファイルに書く間隔（秒）。区切りが終われば間隔によらず書く
+ROLLUP_FLUSH_SECONDS = float(os.getenv("WEATHER_HISTORY_ROLLUP_FLUSH", "300"))
+
+# 集計の列ごとの合わせ方（同じ bucket の行を1行にまとめるとき）
+_ROLLUP_AGGREGATIONS = {
+    f"{metric}_{stat}": stat if stat in ("min", "max") else "sum"
+    for metric in ROLLUP_METRICS
+    for stat in ("count", "sum", "min", "max")
+}
+
+
+def _rollup_columns():
+    return ["bucket", *_ROLLUP_AGGREGATIONS]
+
+
+class _OpenBucket:
+    """まだファイルに書いていない1つの bucket の集計（件数・合計・最小・最大）"""
+
+    __slots__ = ("path", "bucket", "values")
+
+    def __init__(self, path, bucket):
+        self.path = path
+        self.bucket = bucket
+        self.values = {metric: [0, 0.0, np.nan, np.nan] for metric in ROLLUP_METRICS}
+
+    def add(self, record):
+        for metric, (count, total, low, high) in self.values.items():
+            value = record[metric]
+            if value is None or np.isnan(value):
+                continue
+            self.values[metric] = [count + 1, total + value, np.fmin(low, value), np.fmax(high, value)]
+
+    def row(self):
+        row = {"bucket": self.bucket}
+        for metric, values in self.values.items():
+            row.update(zip((f"{metric}_count", f"{metric}_sum", f"{metric}_min", f"{metric}_max"), values))
+        return row
+
+    def empty(self):
+        return not any(count for count, _, _, _ in self.values.values())
+
+
+class HistoryStore:
+    """取得した天気を都市・日ごとのParquetファイルに追記していく時系列ストア
+
+    <root>/observations/city=<キー>/date=YYYY-MM-DD/part-*.parquet     現在の天気（取得ごと）
+    <root>/forecast_hourly/city=<キー>/date=YYYY-MM-DD/part-*.parquet  時間ごとの予報（発表ごと）
+    <root>/forecast_daily/city=<キー>/date=YYYY-MM-DD/part-*.parquet   日ごとの予報（発表ごと）
+    <root>/rollup_hourly/city=<キー>/date=YYYY-MM-DD.parquet           観測の1時間ごとの集計
+    <root>/rollup_daily/city=<キー>/month=YYYY-MM.parquet              観測の1日ごとの集計
+
+    生データは追記するだけで書き換えない（終わった日の part は compact() で1ファイルにまとめる）。
+    まとめたファイルは part-<まとめた最後の part の時刻>-compacted.parquet で、それ以前の part は読まない。
+    集計はいま開いている1時間と1日の分をメモリに持ち、その区切りが終わったとき（と rollup_flush_seconds 秒ごと）に
+    ファイルの行へ足す。read() はメモリの分も合わせて返す。時刻はすべてUTC。
+    書き込みはこのプロセスの1本のスレッドで順に行う（複数のプロセスから同じ root に書かない）。
+    1日1回のまとめ直しは別のスレッドで行い、追記を待たせない。
+    """
+
+    def __init__(self, root, rollup_flush_seconds=ROLLUP_FLUSH_SECONDS):
+        self.root = root
+        self.rollup_flush_seconds = rollup_flush_seconds
+        os.makedirs(root, exist_ok=True)
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="weather-history")
+        self._compaction_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="weather-history-compact")
+        self._last_observation = {}  # キー -> 最後に追記した観測（同じ観測の重複を避ける）
+        self._open_buckets = {}  # (resolution, キー) -> _OpenBucket
+        self._rollups_written_at = time.monotonic()
+        self._compacted_day = None
+        self._lock = threading.Lock()
+        self.appended_rows = 0
+        self.duplicates = 0
+        self.errors = 0
+
+    # --- 書き込み ---
+
+    def record(self, key, result, fetched_at=None):
+        """取得結果（WeatherResult）を書き込みスレッドに渡す（取得の待ち時間には含めない）"""
+        if not result.ok:
+            return None
+        return self._pool.submit(self._record, key, result, fetched_at or time.time())
+
+    def _record(self, key, result, fetched_at):
+        try:
+            with span("history.append", kind=type(result.data).__name__):
+                data = result.data
+                if isinstance(data, CurrentWeather):
+                    self._append_observation(key, data, result.provider, fetched_at)
+                elif isinstance(data, HourlyForecast):
+                    self._append_forecast("forecast_hourly", key, data.to_frame(), fetched_at)
+                elif isinstance(data, DailyForecast):
+                    self._append_forecast("forecast_daily", key, data.to_frame(), fetched_at)
+            if time.monotonic() - self._rollups_written_at >= self.rollup_flush_seconds:
+                self._write_rollups()
+            self._compact_once_a_day()
+        except Exception as e:
+            with self._lock:
+                self.errors += 1
+            logger.warning("履歴の書き込みエラー", extra={"key": key, "error": str(e)})
+
+    def _append_observation(self, key, weather, provider, fetched_at):
+        record = weather.to_record()
+        signature = (weather.observed_at, provider, *(record[metric] for metric in OBSERVATION_METRICS))
+        if self._last_observation.get(key) == signature:
+            # キャッシュの再取得で同じ観測がもう一度届いただけ
+            with self._lock:
+                self.duplicates += 1
+            return
+        self._last_observation[key] = signature
+        ts = pd.Timestamp(fetched_at, unit="s", tz="UTC").floor("s")
+        frame = pd.DataFrame([{
+            "ts": ts,
+            "city_name": weather.city_name,
+            "country_code": weather.country_code,
+            "provider": provider or "",
+            "observed_at": weather.observed_at,
+            **{metric: float(record[metric]) for metric in OBSERVATION_METRICS},
+        }])
+        self._write_part("observations", key, ts, frame)
+        self._add_to_rollup("hourly", key, f"date={ts:%Y-%m-%d}.parquet", ts.floor("h"), record)
+        self._add_to_rollup("daily", key, f"month={ts:%Y-%m}.parquet", ts.floor("D"), record)
+
+    def _append_forecast(self, dataset, key, frame, fetched_at):
+        issued_at = pd.Timestamp(fetched_at, unit="s", tz="UTC").floor("s")
+        frame = frame.drop(columns=["icon"])
+        frame.insert(0, "issued_at", issued_at)
+        self._write_part(dataset, key, issued_at, frame)
+
+    def _path(self, dataset, key, *parts):
+        # "gh:xn774" のようなキーもファイル名に使えるようにする
+        return os.path.join(self.root, dataset, f"city={quote(str(key).replace(':', '_'), safe='')}", *parts)
+
+    def _write_part(self, dataset, key, ts, frame):
+        directory = self._path(dataset, key, f"date={ts:%Y-%m-%d}")
+        os.makedirs(directory, exist_ok=True)
+        name = f"part-{time.time_ns()}-{uuid.uuid4().hex[:8]}.parquet"
+        self._write_atomic(frame, os.path.join(directory, name))
+        with self._lock:
+            self.appended_rows += len(frame)
+
+    def _write_atomic(self, frame, path):
+        """一時ファイルに書いてから置き換える（読み出し側に書きかけのファイルを見せない）"""
+        # "." で始まる名前は pyarrow も _day_parts() も読まない
+        directory, name = os.path.split(path)
+        temporary = os.path.join(directory, f".{name}.{uuid.uuid4().hex[:8]}.tmp")
+        frame.to_parquet(temporary, index=False)
+        os.replace(temporary, path)
+
+    def _add_to_rollup(self, resolution, key, name, bucket, record):
+        """開いている bucket に1件分の観測を足す（区切りが変わったら前の bucket をファイルに書く）"""
+        closed = None
+        with self._lock:
+            current = self._open_buckets.get((resolution, key))
+            if current is None or current.bucket != bucket:
+                closed = current
+                current = self._open_buckets[(resolution, key)] = _OpenBucket(
+                    self._path(f"rollup_{resolution}", key, name), bucket
+                )
+            current.add(record)
+        if closed is not None and not closed.empty():
+            self._merge_rollup(closed.path, [closed.row()])
+
+    def _write_rollups(self):
+        """開いている bucket の分を集計ファイルに足し、メモリの分は空にする（区切りはそのまま）"""
+        rows = {}
+        with self._lock:
+            for name, current in list(self._open_buckets.items()):
+                if not current.empty():
+                    rows.setdefault(current.path, []).append(current.row())
+                    self._open_buckets[name] = _OpenBucket(current.path, current.bucket)
+            self._rollups_written_at = time.monotonic()
+        for path, path_rows in rows.items():
+            self._merge_rollup(path, path_rows)
+
+    def _merge_rollup(self, path, rows):
+        """集計ファイルに行を足す（同じ bucket の行は件数・合計・最小・最大を合わせて1行にする）"""
+        frame = pd.DataFrame(rows, columns=_rollup_columns())
+        if os.path.exists(path):
+            frame = pd.concat([pd.read_parquet(path), frame], ignore_index=True)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._write_atomic(self._combine_rollups(frame), path)
+
+    @staticmethod
+    def _combine_rollups(frame):
+        frame = frame.astype({column: "int64" if column.endswith("_count") else "float64" for column in _ROLLUP_AGGREGATIONS})
+        frame["bucket"] = pd.to_datetime(frame["bucket"], utc=True)
+        return frame.groupby("bucket", as_index=False, sort=True).agg(_ROLLUP_AGGREGATIONS)
+
+    def _pending_rollups(self, resolution, key):
+        """まだファイルに書いていない集計の行（read() で合わせる）"""
+        with self._lock:
+            current = self._open_buckets.get((resolution, key))
+            return [] if current is None or current.empty() else [current.row()]
+
+    # --- まとめ直し ---
+
+    @staticmethod
+    def _day_parts(directory):
+        """日のディレクトリで読むべき part（まとめ済みのファイルに含まれる part は除く）と、除いた part
+
+        compact() はまとめたファイルを置いてから元の part を消すので、途中で読んでも重複しない。
+        """
+        parts = []
+        for entry in os.scandir(directory):
+            if entry.name.startswith("part-") and entry.name.endswith(".parquet"):
+                try:
+                    ns = int(entry.name.split("-")[1])
+                except ValueError:
+                    continue
+                parts.append((ns, entry.name.endswith("-compacted.parquet"), entry.path))
+        parts.sort()
+        compacted = max((ns for ns, is_compacted, _ in parts if is_compacted), default=None)
+        live, superseded = [], []
+        for ns, is_compacted, path in parts:
+            if compacted is None or ns > compacted or (is_compacted and ns == compacted):
+                live.append(path)
+            else:
+                superseded.append(path)
+        return live, superseded
+
+    def _compact_once_a_day(self):
+        today = pd.Timestamp.now(tz="UTC").strftime("%Y-%m-%d")
+        if self._compacted_day != today:
+            self._compacted_day = today
+            self._compaction_pool.submit(self._compact_in_background, today)
+
+    def _compact_in_background(self, before):
+        try:
+            with span("history.compact"):
+                self.compact(before=before)
+        except Exception as e:
+            with self._lock:
+                self.errors += 1
+            logger.warning("履歴のまとめ直しエラー", extra={"before": before, "error": str(e)})
+
+    def compact(self, before=None):
+        """before（"YYYY-MM-DD"、既定は今日）より前の日の part を1ファイルにまとめる"""
+        before = before or pd.Timestamp.now(tz="UTC").strftime("%Y-%m-%d")
+        compacted = 0
+        for dataset in ("observations", "forecast_hourly", "forecast_daily"):
+            base = os.path.join(self.root, dataset)
+            if not os.path.isdir(base):
+                continue
+            for city in os.scandir(base):
+                for day in os.scandir(city.path):
+                    if day.name[len("date="):] >= before:
+                        continue
+                    parts, superseded = self._day_parts(day.path)
+                    if len(parts) > 1:
+                        frame = pd.concat([pd.read_parquet(part) for part in parts], ignore_index=True)
+                        last = os.path.basename(parts[-1]).split("-")[1]
+                        # 置いた時点で、読み出し側はまとめた part を読まなくなる
+                        self._write_atomic(frame, os.path.join(day.path, f"part-{last}-compacted.parquet"))
+                        superseded += parts
+                        compacted += 1
+                    for part in superseded:
+                        try:
+                            os.remove(part)
+                        except FileNotFoundError:
+                            pass
+        return compacted
+
+    # --- 読み出し ---
+
+    def read(self, key, days, resolution=None, now=None):
+        """直近 days 日分の観測を返す（resolution 省略時は日数に応じて選ぶ）
+
+        "raw" は ts と観測値の列、"hourly" / "daily" は bucket と {値}_min / _mean / _max の列。
+        読むファイルは期間に含まれる日（1日ごとの集計なら月）の分だけ。
+        """
+        resolution = resolution or choose_resolution(days)
+        now = now or pd.Timestamp.now(tz="UTC")
+        since = now - timedelta(days=days)
+        dates = pd.date_range(since.floor("D"), now.floor("D"), freq="D")
+        with span(f"history.read.{resolution}", days=days) as attributes:
+            if resolution == "raw":
+                paths = [self._path("observations", key, f"date={date:%Y-%m-%d}") for date in dates]
+                frame = self._concat([self._read_day(path) for path in paths if os.path.isdir(path)])
+                if not frame.empty:
+                    frame = frame[frame["ts"] >= since].sort_values("ts", ignore_index=True)
+            else:
+                if resolution == "hourly":
+                    names = [f"date={date:%Y-%m-%d}.parquet" for date in dates]
+                else:
+                    names = [f"month={month}.parquet" for month in dict.fromkeys(f"{date:%Y-%m}" for date in dates)]
+                paths = [self._path(f"rollup_{resolution}", key, name) for name in names]
+                frame = self._read_paths([path for path in paths if os.path.exists(path)])
+                pending = self._pending_rollups(resolution, key)
+                if pending:
+                    frame = self._combine_rollups(self._concat([frame, pd.DataFrame(pending, columns=_rollup_columns())]))
+                if not frame.empty:
+                    frame = self._finish_rollup(frame[frame["bucket"] >= since.floor("h" if resolution == "hourly" else "D")])
+            attributes["rows"] = len(frame)
+        return frame
+
+    def _read_day(self, directory, attempts=3):
+        """日のディレクトリの part を読む（読んでいる途中に compact() で消えたら一覧から読み直す）"""
+        for attempt in range(attempts):
+            try:
+                return self._read_paths(self._day_parts(directory)[0])
+            except FileNotFoundError:
+                if attempt == attempts - 1:
+                    raise
+
+    def _read_paths(self, paths):
+        return self._concat([pd.read_parquet(path) for path in paths])
+
+    @staticmethod
+    def _concat(frames):
+        frames = [frame for frame in frames if not frame.empty]
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+    def _finish_rollup(self, frame):
+        """件数・合計・最小・最大から min / mean / max の列にする"""
+        result = {"bucket": frame["bucket"].to_numpy()}
+        for metric in ROLLUP_METRICS:
+            count = frame[f"{metric}_count"].to_numpy(dtype=np.float64)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                mean = frame[f"{metric}_sum"].to_numpy() / count
+            result[f"{metric}_min"] = frame[f"{metric}_min"].to_numpy()
+            result[f"{metric}_mean"] = np.where(count > 0, mean, np.nan)
+            result[f"{metric}_max"] = frame[f"{metric}_max"].to_numpy()
+        return pd.DataFrame(result).sort_values("bucket", ignore_index=True)
+
+    def stats(self):
+        """追記した行数・重複として捨てた観測・書き込みエラーの数を返す"""
+        with self._lock:
+            return {"appended_rows": self.appended_rows, "duplicates": self.duplicates, "errors": self.errors}
+
+    def flush(self, timeout=None):
+        """書き込み待ちの分が終わるまで待ち、開いている集計もファイルに書く"""
+        self._pool.submit(self._write_rollups).result(timeout=timeout)
+
+    def close(self):
+        """書き込みを止めて、開いている集計をファイルに書く（プロセス終了時）"""
+        self._pool.shutdown(wait=True)
+        self._compaction_pool.shutdown(wait=True)
+        self._write_rollups()
+
+
+def open_history_store(path=None):
+    """WEATHER_HISTORY_PATH（未設定なら天気ストアの隣の history/）に履歴ストアを開く
+
+    Parquet の読み書きには pyarrow が必要。なければ履歴は記録しない（None）。
+    """
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        logger.warning("pyarrow がないため天気の履歴を記録しません")
+        return None
+    store_path = os.getenv("WEATHER_STORE_PATH") or DEFAULT_STORE_PATH
+    path = path or os.getenv("WEATHER_HISTORY_PATH") or os.path.join(os.path.dirname(store_path), "history")
+    try:
+        store = HistoryStore(path)
+    except OSError as e:
+        logger.warning("履歴ストアを開けません", extra={"path": path, "error": str(e)})
+        return None
+    atexit.register(store.close)
+    return store
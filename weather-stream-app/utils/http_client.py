@@ -0,0 +1,84 @@
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# 外部APIごとのタイムアウト（秒）: (接続, 読み込み)
+TIMEOUTS = {
+    "weatherbit": (3.05, 10),
+    "ipify": (2, 3),
+    "ipinfo": (2, 4),
+    "open-meteo": (3.05, 10),
+    "open-meteo-geocoding": (2, 5),
+    "default": (3.05, 10),
+}
+
+# リトライ対象のステータスコード（レート制限とサーバーエラー）
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Retry-After に従って待つ最長の秒数（これより長い指定でもこの秒数でリトライする）
+MAX_RETRY_AFTER = 5.0
+
+
+class CappedRetry(Retry):
+    """Retry-After の待ち時間を MAX_RETRY_AFTER 秒までに抑えるリトライ設定
+
+    429/503 の Retry-After をそのまま使うと、スクリプトのスレッドが上流の指定どおり何分も止まる。
+    """
+
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        return None if retry_after is None else min(retry_after, MAX_RETRY_AFTER)
+
+
+def _build_retry(total=3, backoff_factor=0.5, backoff_jitter=0.3, read=None, status_forcelist=RETRY_STATUSES):
+    """指数バックオフ＋ジッター付きのリトライ設定を作成"""
+    options = dict(
+        total=total,
+        connect=total,
+        read=total if read is None else read,
+        status=total,
+        backoff_factor=backoff_factor,
+        status_forcelist=status_forcelist,
+        allowed_methods=frozenset(["GET"]),
+        respect_retry_after_header=bool(status_forcelist),
+        raise_on_status=False,  # 最終的な判定は raise_for_status() に任せる
+    )
+    try:
+        return CappedRetry(backoff_jitter=backoff_jitter, backoff_max=MAX_RETRY_AFTER, **options)
+    except TypeError:
+        # urllib3 1.x には backoff_jitter / backoff_max がない（バックオフの上限はクラス属性）
+        retry = CappedRetry(**options)
+        retry.BACKOFF_MAX = MAX_RETRY_AFTER
+        return retry
+
+
+def create_session(pool_maxsize=32):
+    """Keep-Alive接続を使い回すリトライ付きセッションを作成"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize, max_retries=_build_retry())
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({"Accept-Encoding": "gzip, deflate", "Accept": "application/json"})
+    return session
+
+
+def mount_metered_adapter(session, prefix, pool_maxsize=32):
+    """利用枠を数えるAPI（WeatherBit）用のアダプターを prefix に取り付ける
+
+    上流に届いた可能性のあるリクエスト（読み込みエラー・429・5xx）はここでは再送しない。
+    呼び出し側が1回ごとに利用枠を取ってからリトライする。接続エラーだけはここで再試行する。
+    """
+    adapter = HTTPAdapter(
+        pool_connections=1, pool_maxsize=pool_maxsize, max_retries=_build_retry(read=0, status_forcelist=()),
+    )
+    session.mount(prefix, adapter)
+    return adapter
+
+
+def timeout_for(service):
+    """サービス名に対応するタイムアウトを返す"""
+    return TIMEOUTS.get(service, TIMEOUTS["default"])
+
+
+# 全セッションで共有するHTTPセッション
+http_session = create_session()
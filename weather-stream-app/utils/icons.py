@@ -0,0 +1,111 @@
+import hashlib
+import os
+import shutil
+import threading
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ANIMATED_ICON_DIR = os.path.join(APP_DIR, "assets", "animated-icons")
+STATIC_ICON_DIR = os.path.join(APP_DIR, "static", "icons")
+
+# WeatherBitのアイコンコード（末尾のd/nを除く）→ アニメーションSVG名
+# {dn} は昼なら "day"、夜なら "night" に置き換える
+WEATHERBIT_ICON_MAP = {
+    "t01": "thunderstorms-{dn}-rain",
+    "t02": "thunderstorms-{dn}-rain",
+    "t03": "thunderstorms-rain",
+    "t04": "thunderstorms-{dn}",
+    "t05": "hail",
+    "d01": "partly-cloudy-{dn}-drizzle",
+    "d02": "drizzle",
+    "d03": "drizzle",
+    "r01": "partly-cloudy-{dn}-rain",
+    "r02": "rain",
+    "r03": "rain",
+    "r04": "partly-cloudy-{dn}-rain",
+    "r05": "rain",
+    "r06": "rain",
+    "f01": "sleet",
+    "s01": "partly-cloudy-{dn}-snow",
+    "s02": "snow",
+    "s03": "snow",
+    "s04": "sleet",
+    "s05": "sleet",
+    "s06": "partly-cloudy-{dn}-snow",
+    "a01": "mist",
+    "a02": "smoke",
+    "a03": "haze-{dn}",
+    "a04": "dust-{dn}",
+    "a05": "fog-{dn}",
+    "a06": "fog",
+    "c01": "clear-{dn}",
+    "c02": "partly-cloudy-{dn}",
+    "c03": "cloudy",
+    "c04": "overcast-{dn}",
+    "u00": "raindrops",
+}
+FALLBACK_ICON = "not-available"
+
+
+class IconResolver:
+    """WeatherBitのアイコンコードを同梱のアニメーションSVGに対応付ける
+
+    SVGは内容のハッシュを付けた名前で static/icons にコピーし、Streamlitの
+    静的ファイル配信（server.enableStaticServing）から配信する。内容が変われば
+    URLも変わるので、ブラウザは同じURLをキャッシュし続けてよい。
+    対応するSVGがないコードは、ローカルのPNGミラー（WEATHERBIT_ICON_MIRROR）を探す。
+    """
+
+    def __init__(self, registry, source_dir=ANIMATED_ICON_DIR, static_dir=STATIC_ICON_DIR, mirror_dir=None):
+        self.registry = registry  # data URL を作るときに使う AssetRegistry
+        self.source_dir = source_dir
+        self.static_dir = static_dir
+        self.mirror_dir = mirror_dir or os.getenv("WEATHERBIT_ICON_MIRROR")
+        self._published = {}  # 元ファイルのパス -> 公開ファイル名
+        self._lock = threading.Lock()
+
+    def icon_name(self, code):
+        """アイコンコードに対応するSVG名（拡張子なし）を返す"""
+        code = (code or "").strip()
+        template = WEATHERBIT_ICON_MAP.get(code[:3])
+        if template is None:
+            return None
+        return template.format(dn="night" if code.endswith("n") else "day")
+
+    def source_path(self, code):
+        """アイコンコードに対応するローカルファイルのパスを返す"""
+        name = self.icon_name(code)
+        if name:
+            path = os.path.join(self.source_dir, f"{name}.svg")
+            if os.path.exists(path):
+                return path
+        if self.mirror_dir and code:
+            path = os.path.join(self.mirror_dir, f"{code}.png")
+            if os.path.exists(path):
+                return path
+        return os.path.join(self.source_dir, f"{FALLBACK_ICON}.svg")
+
+    def publish(self, path):
+        """ファイルをハッシュ付きの名前で static/icons にコピーし、そのファイル名を返す"""
+        with self._lock:
+            published = self._published.get(path)
+            if published is not None:
+                return published
+            with open(path, "rb") as file:
+                digest = hashlib.sha256(file.read()).hexdigest()[:12]
+            stem, ext = os.path.splitext(os.path.basename(path))
+            published = f"{stem}.{digest}{ext}"
+            target = os.path.join(self.static_dir, published)
+            if not os.path.exists(target):
+                os.makedirs(self.static_dir, exist_ok=True)
+                shutil.copyfile(path, target)
+            self._published[path] = published
+            return published
+
+    def url_for(self, code, base_url_path="", static_serving=True):
+        """アイコンコードのURLを返す（静的配信が無効ならdata URL）"""
+        path = self.source_path(code)
+        if not static_serving:
+            return self.registry.data_url(path)
+        published = self.publish(path)
+        prefix = "/" + base_url_path.strip("/") if base_url_path.strip("/") else ""
+        return f"{prefix}/app/static/icons/{published}"
@@ -0,0 +1,232 @@
+import logging
+from dataclasses import dataclass
+from typing import Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger("weather.models")
+
+
+def _number(value):
+    """数値ならfloatに、そうでなければNoneにする"""
+    if isinstance(value, bool):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _column(items, name):
+    """辞書のリストから数値列を取り出す（欠損はNaN）"""
+    return np.array([_number(item.get(name)) for item in items], dtype=np.float64)
+
+
+def _timestamps(items, name):
+    """辞書のリストから日時列を取り出す（解析できないものはNaT）"""
+    values = pd.to_datetime([item.get(name) or None for item in items], errors="coerce")
+    return values.to_numpy(dtype="datetime64[s]")
+
+
+def _icons(items):
+    return tuple((item.get("weather") or {}).get("icon", "") for item in items)
+
+
+@dataclass(slots=True, frozen=True)
+class CurrentWeather:
+    """現在の天気（WeatherBit current の1件分）"""
+
+    city_name: str
+    country_code: str
+    description: str
+    icon: str
+    observed_at: str
+    temp: Optional[float]
+    app_temp: Optional[float]
+    dewpt: Optional[float]
+    rh: Optional[float]
+    clouds: Optional[float]
+    uv: Optional[float]
+    vis: Optional[float]
+    pres: Optional[float]
+    wind_spd: Optional[float]
+    wind_cdir_full: str
+    sunrise: str
+    sunset: str
+
+    @classmethod
+    def from_json(cls, payload):
+        item = payload["data"][0]
+        weather = item.get("weather") or {}
+        return cls(
+            city_name=item.get("city_name") or "",
+            country_code=item.get("country_code") or "",
+            description=weather.get("description") or "N/A",
+            icon=weather.get("icon") or "",
+            observed_at=item.get("datetime") or "N/A",
+            temp=_number(item.get("temp")),
+            app_temp=_number(item.get("app_temp")),
+            dewpt=_number(item.get("dewpt")),
+            rh=_number(item.get("rh")),
+            clouds=_number(item.get("clouds")),
+            uv=_number(item.get("uv")),
+            vis=_number(item.get("vis")),
+            pres=_number(item.get("pres")),
+            wind_spd=_number(item.get("wind_spd")),
+            wind_cdir_full=item.get("wind_cdir_full") or "N/A",
+            sunrise=item.get("sunrise") or "N/A",
+            sunset=item.get("sunset") or "N/A",
+        )
+
+    def to_record(self):
+        """1行分の辞書にする（CSV/Parquet書き出し用、欠損値はNaN）"""
+        return {name: np.nan if getattr(self, name) is None else getattr(self, name) for name in self.__slots__}
+
+
+@dataclass(slots=True, frozen=True)
+class HourlyForecast:
+    """時間ごとの予報（列ごとの配列で保持）"""
+
+    city_name: str
+    country_code: str
+    timestamps: np.ndarray  # datetime64[s]（現地時刻）
+    timestamps_utc: np.ndarray  # datetime64[s]（UTC。都市どうしの時刻合わせ用、なければNaT）
+    temp: np.ndarray
+    app_temp: np.ndarray
+    rh: np.ndarray
+    pop: np.ndarray
+    precip: np.ndarray
+    wind_spd: np.ndarray
+    icons: Tuple[str, ...]
+
+    def __len__(self):
+        return len(self.temp)
+
+    @classmethod
+    def from_json(cls, payload):
+        items = payload["data"]
+        return cls(
+            city_name=payload.get("city_name") or "",
+            country_code=payload.get("country_code") or "",
+            timestamps=_timestamps(items, "timestamp_local"),
+            timestamps_utc=_timestamps(items, "timestamp_utc"),
+            temp=_column(items, "temp"),
+            app_temp=_column(items, "app_temp"),
+            rh=_column(items, "rh"),
+            pop=_column(items, "pop"),
+            precip=_column(items, "precip"),
+            wind_spd=_column(items, "wind_spd"),
+            icons=_icons(items),
+        )
+
+    def to_frame(self):
+        """列をそのまま DataFrame にする（CSV/Parquet書き出し用）"""
+        return pd.DataFrame({
+            "timestamp": self.timestamps,
+            "temp": self.temp,
+            "app_temp": self.app_temp,
+            "rh": self.rh,
+            "pop": self.pop,
+            "precip": self.precip,
+            "wind_spd": self.wind_spd,
+            "icon": self.icons,
+        })
+
+
+@dataclass(slots=True, frozen=True)
+class DailyForecast:
+    """日ごとの予報（列ごとの配列で保持）"""
+
+    city_name: str
+    country_code: str
+    dates: np.ndarray  # datetime64[s]
+    temp: np.ndarray
+    max_temp: np.ndarray
+    min_temp: np.ndarray
+    pop: np.ndarray
+    precip: np.ndarray
+    icons: Tuple[str, ...]
+
+    def __len__(self):
+        return len(self.temp)
+
+    @classmethod
+    def from_json(cls, payload):
+        items = payload["data"]
+        return cls(
+            city_name=payload.get("city_name") or "",
+            country_code=payload.get("country_code") or "",
+            dates=_timestamps(items, "datetime"),
+            temp=_column(items, "temp"),
+            max_temp=_column(items, "max_temp"),
+            min_temp=_column(items, "min_temp"),
+            pop=_column(items, "pop"),
+            precip=_column(items, "precip"),
+            icons=_icons(items),
+        )
+
+    def to_frame(self):
+        """列をそのまま DataFrame にする（CSV/Parquet書き出し用）"""
+        return pd.DataFrame({
+            "date": self.dates,
+            "temp": self.temp,
+            "max_temp": self.max_temp,
+            "min_temp": self.min_temp,
+            "pop": self.pop,
+            "precip": self.precip,
+            "icon": self.icons,
+        })
+
+
+@dataclass(slots=True, frozen=True)
+class WeatherResult:
+    """天気取得の結果（データかエラーのどちらか）"""
+
+    data: Union[CurrentWeather, HourlyForecast, DailyForecast, None] = None
+    error: Optional[str] = None
+    provider: Optional[str] = None  # 取得元のプロバイダー名（"weatherbit" / "open-meteo"）
+
+    @property
+    def ok(self):
+        return self.error is None and self.data is not None
+
+    @classmethod
+    def failure(cls, message):
+        return cls(error=message)
+
+
+MODELS = {
+    "current": CurrentWeather,
+    "forecast/hourly": HourlyForecast,
+    "forecast/daily": DailyForecast,
+}
+
+
+def parse_response(endpoint, payload):
+    """共通形式（WeatherBit v2 と同じ形）のJSONを一度だけ解析して WeatherResult にする"""
+    if not isinstance(payload, dict):
+        return WeatherResult.failure("エラー: 不正なレスポンスです")
+    if "error" in payload:
+        return WeatherResult.failure(str(payload["error"]))
+    if not payload.get("data"):
+        return WeatherResult.failure("エラー: データがありません")
+    try:
+        return WeatherResult(data=MODELS[endpoint].from_json(payload), provider=payload.get("provider"))
+    except (KeyError, TypeError, ValueError, AttributeError) as e:
+        logger.warning("天気データ解析エラー", extra={"endpoint": endpoint, "error": str(e)})
+        return WeatherResult.failure(f"エラー: {e}")
+
+
+def same_data(a, b):
+    """2つの WeatherResult のデータが同じかどうか（配列は中身で比較）"""
+    if type(a.data) is not type(b.data):
+        return False
+    for name in a.data.__slots__:
+        x, y = getattr(a.data, name), getattr(b.data, name)
+        if isinstance(x, np.ndarray):
+            if x.shape != y.shape or not np.array_equal(x, y, equal_nan=True):
+                return False
+        elif x != y:
+            return False
+    return True
@@ -0,0 +1,186 @@
+import cProfile
+import io
+import marshal
+import pstats
+import threading
+import time
+
+import pandas as pd
+import streamlit as st
+
+from utils.telemetry import current_recorder, set_recorder
+
+# ?debug=profile で有効になる
+PROFILE_QUERY_PARAM = "debug"
+PROFILE_QUERY_VALUE = "profile"
+
+# 計測中のプロファイル -> 計測を始めたスレッド（途中で終わった再実行の計測を止めるため）
+_active_profiles = {}
+_active_lock = threading.Lock()
+
+
+def profiling_requested():
+    """URLのクエリパラメータでプロファイル表示が求められているか"""
+    return st.query_params.get(PROFILE_QUERY_PARAM) == PROFILE_QUERY_VALUE
+
+
+class RunProfile:
+    """1回の再実行の計測結果（区間ごとの時間・上流呼び出し・キャッシュ・cProfile）
+
+    telemetry.span() の区間は、set_recorder() で設定されているあいだだけここに届く。
+    cProfile はスクリプトのスレッドだけを計測する（上流呼び出しは区間で見る）。
+    """
+
+    def __init__(self, scope, use_cprofile=True):
+        self.scope = scope  # "script" または再実行したフラグメント名
+        self.spans = []  # (区間名, 秒, 属性, スレッド名)
+        self.cache_lookups = []  # (キャッシュ名, エンドポイント, 都市, 結果)
+        self.cprofile_error = None
+        self.started = time.perf_counter()
+        self.elapsed = None
+        self._profiler = cProfile.Profile() if use_cprofile else None
+
+    def record_span(self, name, seconds, attributes):
+        self.spans.append((name, seconds, dict(attributes), threading.current_thread().name))
+
+    def record_cache(self, cache, endpoint, city, result):
+        self.cache_lookups.append((cache, endpoint, city, result))
+
+    def start(self):
+        if self._profiler is not None:
+            try:
+                self._profiler.enable()
+            except ValueError as e:
+                # 別のセッションがプロファイル中など（Python 3.12以降はプロセスで1つだけ）
+                self.cprofile_error = str(e)
+                self._profiler = None
+        with _active_lock:
+            _active_profiles[self] = threading.current_thread()
+        set_recorder(self)
+        return self
+
+    def stop(self):
+        if self.elapsed is None:
+            self.elapsed = time.perf_counter() - self.started
+            if self._profiler is not None:
+                self._profiler.disable()
+            with _active_lock:
+                _active_profiles.pop(self, None)
+            set_recorder(None)
+        return self
+
+    def section_frame(self, prefix):
+        """区間名が prefix で始まる区間を DataFrame にする"""
+        rows = [
+            {"section": name[len(prefix):], "ms": seconds * 1000, "thread": thread,
+             **{key: value for key, value in attributes.items() if key != "error"},
+             "error": attributes.get("error", "")}
+            for name, seconds, attributes, thread in self.spans
+            if name.startswith(prefix)
+        ]
+        return pd.DataFrame(rows)
+
+    def cache_frame(self):
+        return pd.DataFrame(self.cache_lookups, columns=["cache", "endpoint", "city", "result"])
+
+    def top_functions(self, limit=25, sort="cumulative"):
+        """cProfile の上位の関数をテキストで返す"""
+        if self._profiler is None:
+            return None
+        buffer = io.StringIO()
+        pstats.Stats(self._profiler, stream=buffer).strip_dirs().sort_stats(sort).print_stats(limit)
+        return buffer.getvalue()
+
+    def dump(self):
+        """pstats / snakeviz で読める .prof 形式のバイト列を返す"""
+        if self._profiler is None:
+            return None
+        self._profiler.create_stats()
+        return marshal.dumps(self._profiler.stats)
+
+
+def _stop_leftover_profiles(include_current_thread=False):
+    """st.stop() / st.rerun() / 例外で結果を表示せずに終わった再実行の計測を止める
+
+    Python 3.12以降の cProfile はプロセスで1つなので、残っていると全セッションが遅くなり、
+    次の計測も始められない。終わったスレッドの計測と（スクリプトの先頭では）同じスレッドの計測を止める。
+    """
+    current = threading.current_thread()
+    with _active_lock:
+        leftovers = [
+            profile for profile, thread in _active_profiles.items()
+            if not thread.is_alive() or (include_current_thread and thread is current)
+        ]
+    for profile in leftovers:
+        profile.stop()
+
+
+def begin_script_profile():
+    """スクリプト全体の再実行の先頭で呼ぶ（無効なら前回のレコーダーを外して None）"""
+    _stop_leftover_profiles(include_current_thread=True)
+    set_recorder(None)
+    if not profiling_requested():
+        return None
+    return RunProfile("script").start()
+
+
+def begin_fragment_profile(fragment):
+    """フラグメントの先頭で呼ぶ（フラグメントだけの再実行のときに計測を始める）"""
+    if not profiling_requested() or current_recorder() is not None:
+        return None
+    _stop_leftover_profiles()
+    return RunProfile(fragment).start()
+
+
+def end_profile():
+    """st.stop() / st.rerun() の前に呼び、パネルを表示しないまま計測を止める"""
+    profile = current_profile()
+    if profile is not None:
+        profile.stop()
+
+
+def current_profile():
+    """この再実行で計測中のプロファイル（なければ None）"""
+    recorder = current_recorder()
+    return recorder if isinstance(recorder, RunProfile) else None
+
+
+def render_profile_panel(profile):
+    """計測を終えて、サイドバーに結果のパネルを表示する"""
+    profile.stop()
+    with st.sidebar, st.expander(f"🛠️ Profile ({profile.scope}): {profile.elapsed * 1000:.0f} ms", expanded=True):
+        sections = pd.concat([profile.section_frame("app."), profile.section_frame("render.")], ignore_index=True)
+        st.markdown("**Sections (wall time)**")
+        if sections.empty:
+            st.caption("No sections ran in this rerun.")
+        else:
+            st.dataframe(sections[["section", "ms"]].round(1), hide_index=True)
+
+        upstream = profile.section_frame("upstream.")
+        st.markdown("**Upstream calls**")
+        if upstream.empty:
+            st.caption("No upstream calls (served from cache).")
+        else:
+            columns = [column for column in ("section", "ms", "status", "thread", "error") if column in upstream]
+            st.dataframe(upstream[columns].round(1), hide_index=True)
+
+        cache = profile.cache_frame()
+        st.markdown("**Cache lookups**")
+        if cache.empty:
+            st.caption("No cache lookups.")
+        else:
+            st.dataframe(cache, hide_index=True)
+
+        if profile.cprofile_error:
+            st.caption(f"cProfile unavailable: {profile.cprofile_error}")
+        report = profile.top_functions()
+        if report:
+            st.markdown("**cProfile (script thread, top by cumulative time)**")
+            st.code(report, language=None)
+            st.download_button(
+                "⬇️ Download cProfile (.prof)",
+                data=profile.dump(),
+                file_name=f"weather-{profile.scope}-{time.strftime('%Y%m%d-%H%M%S')}.prof",
+                mime="application/octet-stream",
+                on_click="ignore",
+            )
@@ -0,0 +1,454 @@
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+
+from utils.http_client import RETRY_STATUSES, mount_metered_adapter, timeout_for
+from utils.telemetry import bind_context, get_logger, metrics, span, upstream_requests
+
+logger = get_logger("providers")
+
+OPEN_METEO_URL = os.getenv("OPEN_METEO_URL", "https://api.open-meteo.com/v1/forecast")
+OPEN_METEO_GEOCODING_URL = os.getenv("OPEN_METEO_GEOCODING_URL", "https://geocoding-api.open-meteo.com/v1/search")
+
+# 使うプロバイダーの順番（先頭が第一候補）
+DEFAULT_PROVIDERS = "weatherbit,open-meteo"
+
+provider_calls = metrics.counter("weather_provider_calls_total", "Provider calls by outcome (ok, error, won, hedged)")
+
+
+class ProviderError(Exception):
+    """どのプロバイダーからも天気を取得できなかった"""
+
+
+def instrumented_get(session, service, url, endpoint="", **kwargs):
+    """外部APIにGETし、所要時間とステータスをメトリクスに記録する"""
+    name = f"upstream.{service}.{endpoint}" if endpoint else f"upstream.{service}"
+    with span(name) as attributes:
+        try:
+            response = session.get(url, timeout=timeout_for(service), **kwargs)
+        except Exception:
+            upstream_requests.inc(service=service, endpoint=endpoint, status="error")
+            raise
+        attributes["status"] = response.status_code
+    upstream_requests.inc(service=service, endpoint=endpoint, status=response.status_code)
+    return response
+
+
+class ProviderStats:
+    """プロバイダーごとの応答時間（直近 window 件）と成功・失敗の回数"""
+
+    def __init__(self, window=200):
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.ok = 0
+        self.errors = 0
+        self.wins = 0
+        self.hedged = 0
+
+    def record(self, seconds, ok):
+        with self._lock:
+            self._latencies.append(seconds)
+            if ok:
+                self.ok += 1
+            else:
+                self.errors += 1
+
+    def percentile(self, q, min_samples=1):
+        """直近の応答時間の q パーセンタイル（件数が min_samples 未満なら None）"""
+        with self._lock:
+            values = sorted(self._latencies)
+        if len(values) < min_samples:
+            return None
+        return values[min(len(values) - 1, round(q / 100 * (len(values) - 1)))]
+
+    def snapshot(self):
+        p50, p95 = self.percentile(50), self.percentile(95)
+        return {
+            "ok": self.ok,
+            "errors": self.errors,
+            "wins": self.wins,
+            "hedged": self.hedged,
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+        }
+
+
+class WeatherProvider:
+    """天気プロバイダーの共通インターフェース
+
+    fetch() は WeatherBit v2 と同じ形の辞書（models.parse_response が読む共通形式）を返し、
+    "provider" にプロバイダー名を入れる。取得できなければ例外を送出する。
+    place（geocode.Place）が渡されたときは都市名ではなくその座標で取得する。
+    """
+
+    name = ""
+
+    def __init__(self, session):
+        self.session = session
+        self.stats = ProviderStats()
+
+    def available(self):
+        """設定（APIキーなど）がそろっていて使えるか"""
+        return True
+
+    def fetch(self, endpoint, city, place=None, **params):
+        raise NotImplementedError
+
+
+class WeatherBitProvider(WeatherProvider):
+    """WeatherBit v2（レスポンスがそのまま共通形式）"""
+
+    name = "weatherbit"
+
+    def __init__(self, session, base_url, api_key, quota, max_attempts=3, backoff_factor=0.5, max_retry_wait=5.0):
+        super().__init__(session)
+        self.base_url = base_url
+        self.api_key = api_key
+        self.quota = quota  # QuotaManager（利用枠切れは QuotaExceededError → 次のプロバイダーへ）
+        self.max_attempts = max_attempts
+        self.backoff_factor = backoff_factor
+        self.max_retry_wait = max_retry_wait
+        # 429・5xx の再送はセッションに任せず fetch() で行う（再送も1回として利用枠を数える）
+        mount_metered_adapter(session, base_url)
+
+    def available(self):
+        return bool(self.api_key)
+
+    def _retry_wait(self, response, attempt):
+        """次の試行までの待ち時間（Retry-After があればそれ、なければ指数バックオフ＋ジッター）"""
+        try:
+            return float(response.headers["Retry-After"])
+        except (KeyError, ValueError):
+            return self.backoff_factor * 2 ** attempt + random.uniform(0, 0.3)
+
+    def fetch(self, endpoint, city, place=None, **params):
+        location = {"lat": place.latitude, "lon": place.longitude} if place is not None else {"city": city}
+        for attempt in range(self.max_attempts):
+            with span("quota.acquire", endpoint=endpoint):
+                self.quota.acquire()
+            response = instrumented_get(
+                self.session, "weatherbit", f"{self.base_url}{endpoint}", endpoint=endpoint,
+                params={**location, "key": self.api_key, **params},
+            )
+            if response.status_code == 429:
+                self.quota.note_rate_limited()
+            if response.status_code not in RETRY_STATUSES or attempt == self.max_attempts - 1:
+                break
+            wait = self._retry_wait(response, attempt)
+            if wait > self.max_retry_wait:
+                # 長く待つより次のプロバイダーに任せる
+                break
+            time.sleep(wait)
+        response.raise_for_status()
+        if response.status_code == 204:
+            # 都市が見つからないと中身のない 204 が返る
+            raise ProviderError(f"WeatherBitに {city} のデータがありません")
+        with span(f"json.{endpoint}", bytes=len(response.content)):
+            payload = response.json()
+        payload["provider"] = self.name
+        return payload
+
+
+# WMO天気コード -> (WeatherBitのアイコンコード（d/nなし）, 説明)
+WMO_WEATHER_CODES = {
+    0: ("c01", "Clear sky"),
+    1: ("c02", "Mainly clear"),
+    2: ("c03", "Partly cloudy"),
+    3: ("c04", "Overcast clouds"),
+    45: ("a05", "Fog"),
+    48: ("a05", "Freezing fog"),
+    51: ("d01", "Light drizzle"),
+    53: ("d02", "Drizzle"),
+    55: ("d03", "Heavy drizzle"),
+    56: ("f01", "Freezing drizzle"),
+    57: ("f01", "Freezing drizzle"),
+    61: ("r01", "Light rain"),
+    63: ("r02", "Moderate rain"),
+    65: ("r03", "Heavy rain"),
+    66: ("f01", "Freezing rain"),
+    67: ("f01", "Freezing rain"),
+    71: ("s01", "Light snow"),
+    73: ("s02", "Snow"),
+    75: ("s03", "Heavy snow"),
+    77: ("s02", "Snow grains"),
+    80: ("r04", "Light shower rain"),
+    81: ("r05", "Shower rain"),
+    82: ("r06", "Heavy shower rain"),
+    85: ("s01", "Snow shower"),
+    86: ("s02", "Heavy snow shower"),
+    95: ("t02", "Thunderstorm"),
+    96: ("t05", "Thunderstorm with hail"),
+    99: ("t05", "Thunderstorm with hail"),
+}
+
+COMPASS_POINTS = (
+    "north", "north-northeast", "northeast", "east-northeast", "east", "east-southeast", "southeast",
+    "south-southeast", "south", "south-southwest", "southwest", "west-southwest", "west", "west-northwest",
+    "northwest", "north-northwest",
+)
+
+
+def _weather(code, is_day=1):
+    """WMO天気コードを WeatherBit の weather 項目（icon, description）にする"""
+    try:
+        prefix, description = WMO_WEATHER_CODES.get(int(code), ("u00", "Unknown"))
+    except (TypeError, ValueError):
+        prefix, description = "u00", "Unknown"
+    return {"icon": f"{prefix}{'d' if is_day in (1, None) else 'n'}", "description": description}
+
+
+def _compass(degrees):
+    if degrees is None:
+        return None
+    return COMPASS_POINTS[round(float(degrees) / 22.5) % 16]
+
+
+def _clock(timestamp):
+    """"2024-01-01T05:48" -> "05:48"（なければ None）"""
+    return timestamp[11:16] if timestamp else None
+
+
+def _first(values):
+    return values[0] if values else None
+
+
+class OpenMeteoProvider(WeatherProvider):
+    """Open-Meteo（座標で予報を取得し、共通形式に変換する。都市名の解決は geocode.GeocodingTable が行う）"""
+
+    name = "open-meteo"
+
+    def __init__(self, session, forecast_url=OPEN_METEO_URL):
+        super().__init__(session)
+        self.forecast_url = forecast_url
+
+    def _forecast(self, endpoint, place, **params):
+        response = instrumented_get(
+            self.session, "open-meteo", self.forecast_url, endpoint=endpoint,
+            params={
+                "latitude": place.latitude,
+                "longitude": place.longitude,
+                "timezone": "auto",
+                "wind_speed_unit": "ms",
+                **params,
+            },
+        )
+        response.raise_for_status()
+        with span(f"json.{endpoint}", bytes=len(response.content)):
+            return response.json()
+
+    def fetch(self, endpoint, city, place=None, **params):
+        if place is None:
+            raise ProviderError(f"{city} の場所が見つかりません")
+        if endpoint == "current":
+            payload = self._current(place)
+        elif endpoint == "forecast/hourly":
+            payload = self._hourly(place, params.get("hours", 24))
+        elif endpoint == "forecast/daily":
+            payload = self._daily(place)
+        else:
+            raise ProviderError(f"Open-Meteoは {endpoint} に対応していません")
+        payload["provider"] = self.name
+        return payload
+
+    def _current(self, place):
+        data = self._forecast(
+            "current", place,
+            current="temperature_2m,apparent_temperature,relative_humidity_2m,dew_point_2m,cloud_cover,"
+                    "surface_pressure,wind_speed_10m,wind_direction_10m,weather_code,is_day,visibility,uv_index",
+            daily="sunrise,sunset",
+            forecast_days=1,
+        )
+        current, daily = data.get("current") or {}, data.get("daily") or {}
+        if not current:
+            raise ProviderError("Open-Meteoの現在の天気が空です")
+        visibility = current.get("visibility")
+        observed = current.get("time") or ""
+        return {"count": 1, "data": [{
+            "city_name": place.name,
+            "country_code": place.country_code,
+            "datetime": f"{observed[:10]}:{observed[11:13]}" if observed else None,
+            "weather": _weather(current.get("weather_code"), current.get("is_day")),
+            "temp": current.get("temperature_2m"),
+            "app_temp": current.get("apparent_temperature"),
+            "dewpt": current.get("dew_point_2m"),
+            "rh": current.get("relative_humidity_2m"),
+            "clouds": current.get("cloud_cover"),
+            "uv": current.get("uv_index"),
+            "vis": visibility / 1000 if visibility is not None else None,  # m -> km
+            "pres": current.get("surface_pressure"),
+            "wind_spd": current.get("wind_speed_10m"),
+            "wind_cdir_full": _compass(current.get("wind_direction_10m")),
+            "sunrise": _clock(_first(daily.get("sunrise"))),
+            "sunset": _clock(_first(daily.get("sunset"))),
+        }]}
+
+    def _hourly(self, place, hours):
+        data = self._forecast(
+            "forecast/hourly", place,
+            hourly="temperature_2m,apparent_temperature,relative_humidity_2m,precipitation_probability,"
+                   "precipitation,wind_speed_10m,weather_code,is_day",
+            forecast_hours=hours,
+        )
+        hourly = data.get("hourly") or {}
+        times = hourly.get("time") or []
+        column = lambda name: hourly.get(name) or [None] * len(times)  # noqa: E731
+        # timezone=auto の時刻は現地時刻なので、utc_offset_seconds を引いて UTC も入れる
+        offset = timedelta(seconds=data.get("utc_offset_seconds") or 0)
+        return {"city_name": place.name, "country_code": place.country_code, "data": [
+            {
+                "timestamp_local": f"{timestamp}:00",
+                "timestamp_utc": f"{datetime.fromisoformat(timestamp) - offset:%Y-%m-%dT%H:%M:%S}",
+                "temp": temp, "app_temp": app_temp, "rh": rh, "pop": pop, "precip": precip, "wind_spd": wind,
+                "weather": _weather(code, is_day),
+            }
+            for timestamp, temp, app_temp, rh, pop, precip, wind, code, is_day in zip(
+                times, column("temperature_2m"), column("apparent_temperature"), column("relative_humidity_2m"),
+                column("precipitation_probability"), column("precipitation"), column("wind_speed_10m"),
+                column("weather_code"), column("is_day"),
+            )
+        ]}
+
+    def _daily(self, place):
+        data = self._forecast(
+            "forecast/daily", place,
+            daily="temperature_2m_max,temperature_2m_min,temperature_2m_mean,precipitation_probability_max,"
+                  "precipitation_sum,weather_code",
+            forecast_days=16,
+        )
+        daily = data.get("daily") or {}
+        dates = daily.get("time") or []
+        column = lambda name: daily.get(name) or [None] * len(dates)  # noqa: E731
+        rows = []
+        for date, high, low, mean, pop, precip, code in zip(
+            dates, column("temperature_2m_max"), column("temperature_2m_min"), column("temperature_2m_mean"),
+            column("precipitation_probability_max"), column("precipitation_sum"), column("weather_code"),
+        ):
+            if mean is None and high is not None and low is not None:
+                mean = round((high + low) / 2, 1)
+            rows.append({
+                "datetime": date, "temp": mean, "max_temp": high, "min_temp": low, "pop": pop, "precip": precip,
+                "weather": _weather(code),
+            })
+        return {"city_name": place.name, "country_code": place.country_code, "data": rows}
+
+
+class HedgedFetcher:
+    """プロバイダーを順に使い、遅いときは次のプロバイダーにも同時に問い合わせる
+
+    第一候補が hedge_after 秒以内に返らなければ次の候補にも送り、先に成功した方を使う
+    （遅い方の結果は捨てる）。エラーのときは待たずに次の候補へ切り替える。
+    hedge_after を指定しなければ、そのプロバイダーの直近の p95 を使う（件数が少ないうちは default_hedge）。
+    """
+
+    def __init__(self, providers, hedge_after=None, default_hedge=1.0, min_hedge=0.25, max_hedge=3.0, max_workers=32):
+        self.providers = [provider for provider in providers if provider.available()]
+        self._hedge_after = hedge_after
+        self.default_hedge = default_hedge
+        self.min_hedge = min_hedge
+        self.max_hedge = max_hedge
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="weather-provider")
+
+    def hedge_after(self, provider):
+        """provider の応答をこれ以上待つなら次の候補にも送る、という秒数"""
+        if self._hedge_after is not None:
+            return self._hedge_after
+        p95 = provider.stats.percentile(95, min_samples=20)
+        if p95 is None:
+            return self.default_hedge
+        return min(self.max_hedge, max(self.min_hedge, p95))
+
+    def _call(self, provider, endpoint, city, place, params):
+        started = time.perf_counter()
+        ok = False
+        try:
+            with span(f"provider.{provider.name}.{endpoint}", city=city):
+                payload = provider.fetch(endpoint, city, place=place, **params)
+            ok = True
+            return payload
+        finally:
+            provider.stats.record(time.perf_counter() - started, ok)
+            provider_calls.inc(provider=provider.name, endpoint=endpoint, outcome="ok" if ok else "error")
+
+    def fetch(self, endpoint, city, place=None, **params):
+        """共通形式の辞書を返す（どのプロバイダーも失敗したら ProviderError）"""
+        candidates = iter(self.providers)
+        pending = {}  # future -> provider
+        errors = []
+
+        def launch():
+            provider = next(candidates, None)
+            if provider is None:
+                return None
+            pending[self._pool.submit(bind_context(self._call), provider, endpoint, city, place, params)] = provider
+            return provider
+
+        latest = launch()
+        if latest is None:
+            raise ProviderError("使えるプロバイダーがありません")
+        hedge_at = time.monotonic() + self.hedge_after(latest)
+        while pending:
+            timeout = max(0.0, hedge_at - time.monotonic()) if hedge_at is not None else None
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                # 時間内に返らなかった: 次の候補にも同じリクエストを送る
+                slow = latest
+                latest = launch()
+                if latest is None:
+                    hedge_at = None
+                    continue
+                slow.stats.hedged += 1
+                provider_calls.inc(provider=slow.name, endpoint=endpoint, outcome="hedged")
+                logger.info("応答が遅いため別のプロバイダーにも問い合わせます",
+                            extra={"slow": slow.name, "hedge": latest.name, "endpoint": endpoint, "city": city})
+                hedge_at = time.monotonic() + self.hedge_after(latest)
+                continue
+            for future in done:
+                provider = pending.pop(future)
+                try:
+                    payload = future.result()
+                except Exception as e:
+                    errors.append(f"{provider.name}: {e}")
+                    logger.warning("プロバイダーエラー", extra={"provider": provider.name, "endpoint": endpoint, "city": city, "error": str(e)})
+                    if not pending:
+                        # 待っている候補がなければ、すぐに次の候補へ切り替える
+                        latest = launch()
+                        if latest is not None:
+                            hedge_at = time.monotonic() + self.hedge_after(latest)
+                    continue
+                provider.stats.wins += 1
+                provider_calls.inc(provider=provider.name, endpoint=endpoint, outcome="won")
+                return payload
+        raise ProviderError("; ".join(errors) or "プロバイダーから応答がありません")
+
+    def stats(self):
+        """プロバイダーごとの応答時間（p50/p95）と成功・失敗・採用・ヘッジの回数"""
+        return {
+            provider.name: {**provider.stats.snapshot(), "hedge_after_ms": round(self.hedge_after(provider) * 1000)}
+            for provider in self.providers
+        }
+
+
+def create_providers(session, weatherbit_base_url, api_key, quota, names=None):
+    """WEATHER_PROVIDERS（カンマ区切り、先頭が第一候補）の順にプロバイダーを作る"""
+    names = names or os.getenv("WEATHER_PROVIDERS", DEFAULT_PROVIDERS)
+    factories = {
+        "weatherbit": lambda: WeatherBitProvider(session, weatherbit_base_url, api_key, quota),
+        "open-meteo": lambda: OpenMeteoProvider(session),
+    }
+    providers = []
+    for name in (part.strip().lower() for part in names.split(",")):
+        if name not in factories:
+            logger.warning("不明なプロバイダーを無視します", extra={"provider": name})
+            continue
+        providers.append(factories[name]())
+    return providers
+
+
+def hedge_after_from_env():
+    """WEATHER_HEDGE_AFTER（秒）。未設定なら None（プロバイダーごとの p95 を使う）"""
+    value = os.getenv("WEATHER_HEDGE_AFTER")
+    return float(value) if value else None
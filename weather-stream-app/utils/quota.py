@@ -0,0 +1,176 @@
+import datetime
+import os
+import threading
+import time
+
+
+class QuotaExceededError(Exception):
+    """APIの利用枠を使い切った、またはレート制限で待ちきれなかった"""
+
+
+class TokenBucket:
+    """1秒あたりのリクエスト数を制限するトークンバケット"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.throttled = 0
+        self.waited_seconds = 0.0
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, timeout=5.0):
+        """トークンを1つ取得（timeout 秒以内に取れなければFalse）"""
+        deadline = time.monotonic() + timeout
+        waited = False
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+                if not waited:
+                    self.throttled += 1
+            waited = True
+            if time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+            with self._lock:
+                self.waited_seconds += wait
+
+
+class DailyBudget:
+    """1日あたりの呼び出し回数を数える（UTCの0時にリセット）
+
+    ledger（store.UsageLedger）を渡すと回数をSQLiteに記録し、再起動や別プロセス
+    （レプリカ・bulk_export.py）とも同じ枠を共有する。なければこのプロセスのメモリだけで数える。
+    """
+
+    # ledger の回数を読み直す間隔（秒）。キャッシュの期限計算のたびにSQLiteを読まない
+    LEDGER_REFRESH_SECONDS = 1.0
+
+    def __init__(self, limit, ledger=None):
+        self.limit = limit
+        self.ledger = ledger
+        self._used = 0
+        self._day = self._today()
+        self._read_at = None  # ledger から最後に回数を読んだ時刻（monotonic）
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _today():
+        return datetime.datetime.now(datetime.timezone.utc).date()
+
+    def _roll_over(self):
+        today = self._today()
+        if today != self._day:
+            self._day = today
+            self._used = 0
+            self._read_at = None
+
+    def consume(self):
+        """1回分を消費（残りがなければFalse）"""
+        if self.ledger is not None:
+            day = self._today()
+            used = self.ledger.consume(day.isoformat(), self.limit)
+            with self._lock:
+                self._day = day
+                self._used = self.limit if used is None else used
+                self._read_at = time.monotonic()
+            return used is not None
+        with self._lock:
+            self._roll_over()
+            if self._used >= self.limit:
+                return False
+            self._used += 1
+            return True
+
+    @property
+    def used(self):
+        with self._lock:
+            self._roll_over()
+            fresh = self._read_at is not None and time.monotonic() - self._read_at < self.LEDGER_REFRESH_SECONDS
+            if self.ledger is None or fresh:
+                return self._used
+        day = self._today()
+        used = self.ledger.used(day.isoformat())
+        with self._lock:
+            self._day, self._used, self._read_at = day, used, time.monotonic()
+        return used
+
+    @property
+    def remaining(self):
+        return max(self.limit - self.used, 0)
+
+
+class QuotaManager:
+    """WeatherBit呼び出しのレート制限と1日の利用枠を管理
+
+    残りの枠が減るほど ttl_multiplier() が大きくなり、キャッシュを長く使う。
+    """
+
+    # (残りの割合の下限, TTL倍率) を割合の大きい順に並べたもの
+    TTL_STEPS = ((0.5, 1), (0.25, 2), (0.1, 4), (0.0, 8))
+
+    def __init__(self, daily_limit=50, rate_per_second=2.0, burst=5, ledger=None):
+        self.bucket = TokenBucket(rate_per_second, burst)
+        self.budget = DailyBudget(daily_limit, ledger)
+        self._lock = threading.Lock()
+        self.rejected = 0
+        self.upstream_rate_limited = 0
+
+    @classmethod
+    def from_env(cls, ledger=None):
+        """環境変数から利用枠の設定を読み込む"""
+        return cls(
+            daily_limit=int(os.getenv("WEATHERBIT_DAILY_LIMIT", "50")),
+            rate_per_second=float(os.getenv("WEATHERBIT_RATE_PER_SECOND", "2")),
+            burst=int(os.getenv("WEATHERBIT_BURST", "5")),
+            ledger=ledger,
+        )
+
+    def _reject(self, message):
+        with self._lock:
+            self.rejected += 1
+        raise QuotaExceededError(message)
+
+    def acquire(self, timeout=5.0):
+        """1回分の呼び出し許可を得る（得られなければ QuotaExceededError）"""
+        if not self.bucket.acquire(timeout):
+            self._reject("レート制限の待ち時間を超えました")
+        if not self.budget.consume():
+            self._reject("1日の利用枠を使い切りました")
+
+    def note_rate_limited(self):
+        """上流から429が返ったことを記録"""
+        with self._lock:
+            self.upstream_rate_limited += 1
+
+    def ttl_multiplier(self):
+        """残りの利用枠に応じたキャッシュ期間の倍率を返す"""
+        limit = self.budget.limit
+        fraction = self.budget.remaining / limit if limit else 0.0
+        for threshold, multiplier in self.TTL_STEPS:
+            if fraction > threshold:
+                return multiplier
+        return self.TTL_STEPS[-1][1]
+
+    def stats(self):
+        """残りの利用枠とスロットリングの統計を返す"""
+        return {
+            "daily_limit": self.budget.limit,
+            "used_today": self.budget.used,
+            "remaining_today": self.budget.remaining,
+            "ttl_multiplier": self.ttl_multiplier(),
+            "throttled": self.bucket.throttled,
+            "throttle_wait_seconds": round(self.bucket.waited_seconds, 3),
+            "rejected": self.rejected,
+            "upstream_rate_limited": self.upstream_rate_limited,
+        }
@@ -0,0 +1,101 @@
+import logging
+import threading
+import time
+
+from utils.cache import normalize_city
+
+logger = logging.getLogger("weather.refresher")
+
+
+def _city_key(city, place=None):
+    return normalize_city(city)
+
+
+class AutoRefresher:
+    """アクティブなセッションが見ている都市だけを定期的に再取得するスレッド
+
+    各セッションは watch() で都市を登録し（ハートビートを兼ねる）、返ってきた
+    版数が前回と変わったときだけ再描画する。idle_timeout 秒のあいだ
+    watch() されなかった都市は対象から外す。
+    place（セッションが解決済みの場所）を渡すと、再取得でも都市名を解決し直さずにそれを使う。
+    """
+
+    def __init__(self, refresh_city, interval=30, idle_timeout=90, key_func=_city_key):
+        self.refresh_city = refresh_city  # (city, hours, include_daily, place) -> データが変わったか
+        self.key_func = key_func  # (city, place) -> 同じ天気を見る都市名を1つにまとめるキー
+        self.interval = interval
+        self.idle_timeout = idle_timeout
+        self._watched = {}  # key_func(city, place) -> [city, hours, include_daily, last_seen, place]
+        self._versions = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self.cycles = 0
+        self.refreshes = 0
+        self.changes = 0
+        self.errors = 0
+
+    def watch(self, city, hours=24, include_daily=True, place=None):
+        """都市を自動更新の対象に登録し、現在の版数を返す"""
+        key = self.key_func(city, place)
+        with self._lock:
+            entry = self._watched.get(key)
+            if entry is None:
+                self._watched[key] = [city, hours, include_daily, time.time(), place]
+            else:
+                # 同じ都市を見ているセッションの条件をまとめる
+                entry[1] = max(entry[1], hours)
+                entry[2] = entry[2] or include_daily
+                entry[3] = time.time()
+                entry[4] = entry[4] or place
+            version = self._versions.get(key, 0)
+        self._ensure_started()
+        return version
+
+    def version(self, city, place=None):
+        """都市のデータ版数（新しいデータが届くたびに増える）"""
+        key = self.key_func(city, place)
+        with self._lock:
+            return self._versions.get(key, 0)
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="weather-auto-refresh", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self.run_once()
+
+    def run_once(self):
+        """期限切れの監視対象を再取得し、データが変わった都市の版数を上げる"""
+        now = time.time()
+        with self._lock:
+            for key in [key for key, entry in self._watched.items() if now - entry[3] > self.idle_timeout]:
+                del self._watched[key]
+            targets = [(key, *entry[:3], entry[4]) for key, entry in self._watched.items()]
+        self.cycles += 1
+
+        for key, city, hours, include_daily, place in targets:
+            try:
+                self.refreshes += 1
+                if self.refresh_city(city, hours, include_daily, place):
+                    with self._lock:
+                        self._versions[key] = self._versions.get(key, 0) + 1
+                    self.changes += 1
+            except Exception as e:
+                logger.warning("自動更新エラー", extra={"city": city, "error": str(e)})
+                self.errors += 1
+
+    def stats(self):
+        """監視中の都市数と更新回数を返す"""
+        with self._lock:
+            watched = len(self._watched)
+        return {
+            "watched_cities": watched,
+            "cycles": self.cycles,
+            "refreshes": self.refreshes,
+            "changes": self.changes,
+            "errors": self.errors,
+        }
@@ -0,0 +1,61 @@
+import threading
+
+
+class _Call:
+    """実行中の1回分の呼び出し"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """同じキーの同時呼び出しを1回の実行にまとめる
+
+    実行中のキーに対する呼び出しは、その結果を待って共有する。
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.executed = 0
+        self.shared = 0
+
+    def do(self, key, func):
+        """key が実行中なら結果を待ち、そうでなければ func() を実行"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.shared += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.executed += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+        else:
+            try:
+                call.result = func()
+            except Exception as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    self._calls.pop(key, None)
+                call.done.set()
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def stats(self):
+        """実行回数と共有（節約）された呼び出し数を返す"""
+        with self._lock:
+            return {
+                "executed": self.executed,
+                "shared": self.shared,
+                "in_flight": len(self._calls),
+            }
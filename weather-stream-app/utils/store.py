@@ -0,0 +1,144 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger("weather.store")
+
+DEFAULT_STORE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "weather.sqlite3")
+
+
+class ForecastStore:
+    """取得した天気データをSQLiteに保存するディスクストア
+
+    キーは (エンドポイント, 場所のキー, 時間数)。場所のキーは geohash のセル（"gh:xn76u"）か、
+    座標に解決できなかったときの正規化した都市名。再起動後のキャッシュ復元に使う。
+    """
+
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS forecasts (
+                endpoint TEXT NOT NULL,
+                city TEXT NOT NULL,
+                hours INTEGER NOT NULL DEFAULT 0,
+                fetched_at REAL NOT NULL,
+                payload TEXT NOT NULL,
+                PRIMARY KEY (endpoint, city, hours)
+            )
+            """
+        )
+        self._conn.commit()
+
+    def save(self, key, payload, fetched_at=None):
+        """レスポンスを保存（同じキーは上書き）"""
+        endpoint, city, hours = key
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO forecasts VALUES (?, ?, ?, ?, ?)",
+                (endpoint, city, hours or 0, fetched_at or time.time(), json.dumps(payload, ensure_ascii=False)),
+            )
+            self._conn.commit()
+
+    def load_recent(self, max_age):
+        """max_age 秒以内に取得したデータを (キー, データ, 取得時刻) で返す"""
+        since = time.time() - max_age
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT endpoint, city, hours, fetched_at, payload FROM forecasts WHERE fetched_at >= ?",
+                (since,),
+            ).fetchall()
+        for endpoint, city, hours, fetched_at, payload in rows:
+            yield (endpoint, city, hours or None), json.loads(payload), fetched_at
+
+    def prune(self, max_age):
+        """max_age 秒より古いデータを削除"""
+        with self._lock:
+            self._conn.execute("DELETE FROM forecasts WHERE fetched_at < ?", (time.time() - max_age,))
+            self._conn.commit()
+
+
+class UsageLedger:
+    """APIの1日あたりの利用回数をSQLiteに記録する（再起動・複数プロセスでも同じ枠を数える）
+
+    1回分の消費は1つの UPSERT で行うので、別プロセスと同時に数えても上限を超えない。
+    """
+
+    KEEP_DAYS = 7  # これより古い日の行は開いたときに消す
+
+    def __init__(self, path=DEFAULT_STORE_PATH, name="weatherbit"):
+        self.path = path
+        self.name = name
+        if path != ":memory:":
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS api_usage (
+                name TEXT NOT NULL,
+                day TEXT NOT NULL,
+                used INTEGER NOT NULL,
+                PRIMARY KEY (name, day)
+            )
+            """
+        )
+        self._conn.execute(
+            "DELETE FROM api_usage WHERE name = ? AND day < date('now', ?)", (name, f"-{self.KEEP_DAYS} days")
+        )
+        self._conn.commit()
+
+    def consume(self, day, limit):
+        """day（"YYYY-MM-DD"）の回数を1増やして増やした後の回数を返す（limit に達していれば None）"""
+        if limit <= 0:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                """
+                INSERT INTO api_usage (name, day, used) VALUES (?, ?, 1)
+                ON CONFLICT (name, day) DO UPDATE SET used = used + 1 WHERE used < ?
+                RETURNING used
+                """,
+                (self.name, day, limit),
+            ).fetchone()
+            self._conn.commit()
+        return row[0] if row else None
+
+    def used(self, day):
+        """day に使った回数"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT used FROM api_usage WHERE name = ? AND day = ?", (self.name, day)
+            ).fetchone()
+        return row[0] if row else 0
+
+
+def open_usage_ledger(path=None, name="weatherbit"):
+    """WEATHER_STORE_PATH と同じSQLiteに利用回数の表を開く（失敗したらNone）"""
+    path = path or os.getenv("WEATHER_STORE_PATH") or DEFAULT_STORE_PATH
+    try:
+        return UsageLedger(path, name)
+    except (sqlite3.Error, OSError) as e:
+        logger.warning("利用回数の表を開けません", extra={"path": path, "error": str(e)})
+        return None
+
+
+def open_forecast_store(path=None):
+    """環境変数 WEATHER_STORE_PATH のストアを開く（失敗したらNone）"""
+    path = path or os.getenv("WEATHER_STORE_PATH") or DEFAULT_STORE_PATH
+    try:
+        return ForecastStore(path)
+    except (sqlite3.Error, OSError) as e:
+        logger.warning("天気ストアを開けません", extra={"path": path, "error": str(e)})
+        return None
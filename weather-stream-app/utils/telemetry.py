@@ -0,0 +1,291 @@
+import contextvars
+import functools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 処理時間ヒストグラムの区切り（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_STANDARD_RECORD_KEYS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """ログを1行のJSONにする（extra で渡した項目もそのまま含める）"""
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        entry.update({key: value for key, value in vars(record).items() if key not in _STANDARD_RECORD_KEYS})
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+_configured = False
+_configure_lock = threading.Lock()
+
+
+def get_logger(name):
+    """構造化ログ用のロガーを返す
+
+    出力先は標準エラー。WEATHER_LOG_FORMAT=text で人が読む形式に、
+    WEATHER_LOG_LEVEL でレベルを変えられる（既定は INFO）。
+    """
+    global _configured
+    with _configure_lock:
+        if not _configured:
+            root = logging.getLogger("weather")
+            handler = logging.StreamHandler(sys.stderr)
+            if os.getenv("WEATHER_LOG_FORMAT", "json") == "text":
+                handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+            else:
+                handler.setFormatter(JsonFormatter())
+            root.addHandler(handler)
+            root.setLevel(os.getenv("WEATHER_LOG_LEVEL", "INFO").upper())
+            root.propagate = False
+            _configured = True
+    return logging.getLogger(f"weather.{name}")
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key):
+    if not key:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in key) + "}"
+
+
+class Counter:
+    """ラベルごとに増えていく値"""
+
+    kind = "counter"
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(_label_key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+
+class Histogram:
+    """ラベルごとの値の分布（Prometheusのhistogramと同じ累積バケット）"""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}  # ラベル -> [バケットごとの件数..., 合計, 件数]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[index] += 1
+            entry[-2] += value
+            entry[-1] += 1
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(entry)) for key, entry in self._values.items()]
+        samples = []
+        for key, entry in items:
+            for bound, count in zip(self.buckets, entry):
+                samples.append((f"{self.name}_bucket", key + (("le", repr(bound)),), count))
+            samples.append((f"{self.name}_bucket", key + (("le", "+Inf"),), entry[-1]))
+            samples.append((f"{self.name}_sum", key, round(entry[-2], 6)))
+            samples.append((f"{self.name}_count", key, entry[-1]))
+        return samples
+
+
+class CallbackMetric:
+    """出力のたびに関数を呼んで値を集める（既存の stats() を公開するため）
+
+    func は [(ラベルの辞書, 値), ...] を返す。
+    """
+
+    def __init__(self, name, help_text, kind, func):
+        self.name = name
+        self.help = help_text
+        self.kind = kind
+        self.func = func
+
+    def samples(self):
+        return [(self.name, _label_key(labels), value) for labels, value in self.func()]
+
+
+class MetricsRegistry:
+    """メトリクスをまとめてPrometheusのテキスト形式で出力する"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, help_text):
+        return self._register(Counter(name, help_text))
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, help_text, buckets))
+
+    def gauge_callback(self, name, help_text, func):
+        return self._register(CallbackMetric(name, help_text, "gauge", func))
+
+    def counter_callback(self, name, help_text, func):
+        return self._register(CallbackMetric(name, help_text, "counter", func))
+
+    def render(self):
+        """Prometheusのテキスト形式の文字列を返す"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            try:
+                samples = metric.samples()
+            except Exception as e:
+                get_logger("telemetry").warning("メトリクス収集エラー", extra={"metric": metric.name, "error": str(e)})
+                continue
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, key, value in samples:
+                lines.append(f"{name}{_format_labels(key)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+# プロセス全体で共有するメトリクス
+metrics = MetricsRegistry()
+span_seconds = metrics.histogram("weather_span_seconds", "Duration of instrumented code spans")
+span_errors = metrics.counter("weather_span_errors_total", "Spans that raised an exception")
+upstream_requests = metrics.counter("weather_upstream_requests_total", "Upstream HTTP requests by service and status")
+reruns = metrics.counter("weather_reruns_total", "Script and fragment reruns")
+
+_span_logger = get_logger("span")
+
+# デバッグ用のプロファイル中だけ設定する、その再実行の区間を集めるレコーダー
+_recorder = contextvars.ContextVar("weather_span_recorder", default=None)
+
+
+def current_recorder():
+    """この再実行で区間を集めているレコーダーを返す（プロファイル中でなければ None）"""
+    return _recorder.get()
+
+
+def set_recorder(recorder):
+    """この再実行（スレッド）のレコーダーを設定する（None で解除）"""
+    _recorder.set(recorder)
+
+
+def bind_context(func):
+    """プロファイル中なら、別スレッドで実行しても区間が同じレコーダーに届くようにする"""
+    if _recorder.get() is None:
+        return func
+    return functools.partial(contextvars.copy_context().run, func)
+
+
+@contextmanager
+def span(name, **fields):
+    """処理時間を測って weather_span_seconds{span=name} に記録し、DEBUGの構造化ログを出す
+
+    name は "upstream.current" のように集計したい単位で付ける（fields はログにだけ入る）。
+    with ブロック内で返された辞書に項目を追加すると、ログにも含まれる。
+    例外はエラーとして数えてからそのまま送出する（st.rerun などの制御用の例外は数えない）。
+    """
+    attributes = dict(fields)
+    started = time.perf_counter()
+    try:
+        yield attributes
+    except Exception as e:
+        span_errors.inc(span=name)
+        attributes["error"] = repr(e)
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        span_seconds.observe(elapsed, span=name)
+        recorder = _recorder.get()
+        if recorder is not None:
+            recorder.record_span(name, elapsed, attributes)
+        if _span_logger.isEnabledFor(logging.DEBUG):
+            _span_logger.debug(name, extra={"span": name, "duration_ms": round(elapsed * 1000, 2), **attributes})
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = metrics
+
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = self.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+_metrics_server = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port=None, host=None):
+    """/metrics を返すHTTPサーバーを別スレッドで起動する（プロセスごとに1回だけ）
+
+    ポートは WEATHER_METRICS_PORT（未設定なら起動しない）。起動できなければ None。
+    """
+    global _metrics_server
+    port = port if port is not None else os.getenv("WEATHER_METRICS_PORT")
+    if not port:
+        return None
+    with _server_lock:
+        if _metrics_server is None:
+            try:
+                _metrics_server = ThreadingHTTPServer(
+                    (host or os.getenv("WEATHER_METRICS_HOST", "0.0.0.0"), int(port)), _MetricsHandler
+                )
+            except OSError as e:
+                get_logger("telemetry").warning("メトリクスサーバーを起動できません", extra={"port": port, "error": str(e)})
+                return None
+            _metrics_server.daemon_threads = True
+            threading.Thread(target=_metrics_server.serve_forever, name="weather-metrics", daemon=True).start()
+        return _metrics_server